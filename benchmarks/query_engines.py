@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""
+Compare the query engines (optimization, binary and descending search) on the examples.
+
+Run from the project root with
+    $ python benchmarks/query_engines.py [--max-value N]
+where --max-value replaces the ValPhi function of networks and graphs with a uniform grid of N values in -10..10.
+"""
+import argparse
+import time
+from pathlib import Path
+
+from valphi.controllers import Controller
+from valphi.networks import NetworkInterface, MaxSAT
+from valphi.options import QueryEngine
+from valphi.utils import PROJECT_ROOT
+
+EXAMPLES = PROJECT_ROOT / "examples"
+
+
+def read_query(path: Path) -> str:
+    with open(path) as f:
+        return ''.join(x.strip() for x in f.readlines())
+
+
+def cases():
+    for network_filename, query_prefix in [("kbmonk1.network", "kbmonk1"), ("small-5.graph", "small-5"),
+                                           ("small-6.graph", "small-6")]:
+        for query_filename in sorted(EXAMPLES.glob(f"{query_prefix}-*.query")):
+            yield network_filename, query_filename.stem, read_query(query_filename)
+    for cnf_filename in sorted(EXAMPLES.glob("*.cnf")):
+        yield cnf_filename.name, "even", "even"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument("--max-value", type=int, default=None)
+    parser.add_argument("--ordered", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'network':<20} {'query':<12} " + ' '.join(f"{engine.value:>13}" for engine in QueryEngine))
+    totals = {engine: 0.0 for engine in QueryEngine}
+    for network_filename, label, query in cases():
+        network = NetworkInterface.parse(EXAMPLES / network_filename)
+        if type(network) is MaxSAT:
+            val_phi = network.val_phi
+        elif args.max_value is not None:
+            val_phi = [-10 + 20 * index / (args.max_value - 1) for index in range(args.max_value)]
+        else:
+            val_phi = Controller.default_val_phi()
+        answers, times = set(), []
+        for engine in QueryEngine:
+            controller = Controller(network=network, val_phi=val_phi, use_ordered_encoding=args.ordered,
+                                    query_engine=engine)
+            start = time.perf_counter()
+            res = controller.answer_query(query)
+            times.append(time.perf_counter() - start)
+            totals[engine] += times[-1]
+            answers.add((res.true, res.consistent_knowledge_base, res.left_concept_value, res.witness))
+        assert len(answers) == 1, f"engines disagree on {network_filename} {label}: {answers}"
+        print(f"{network_filename:<20} {label:<12} " + ' '.join(f"{seconds:>13.3f}" for seconds in times))
+    print(f"{'total':<33} " + ' '.join(f"{totals[engine]:>13.3f}" for engine in QueryEngine))
+
+
+if __name__ == "__main__":
+    main()
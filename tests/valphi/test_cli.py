@@ -1,9 +1,13 @@
+import subprocess
+import sys
+
 import clingo
 import pytest
 from click import UsageError
 from typer.testing import CliRunner
 
 from valphi.cli import app
+from valphi.networks import NetworkInterface
 from valphi.utils import PROJECT_ROOT
 
 
@@ -27,3 +31,116 @@ def test_solve_feedforward_network_topology(runner):
     ])
     assert result.exit_code == 0
     assert "Solution 10" in result.stdout
+
+
+def test_convert_network_to_binary_and_back(runner, tmp_path):
+    result = runner.invoke(app, [
+        "-t", PROJECT_ROOT / "examples/kbmonk1.network",
+        "convert",
+        str(tmp_path / "kbmonk1.bin"),
+    ])
+    assert result.exit_code == 0
+    result = runner.invoke(app, [
+        "-t", tmp_path / "kbmonk1.bin",
+        "convert",
+        "--to", "text",
+        str(tmp_path / "kbmonk1.network"),
+    ])
+    assert result.exit_code == 0
+    with open(PROJECT_ROOT / "examples/kbmonk1.network") as original, open(tmp_path / "kbmonk1.network") as converted:
+        assert NetworkInterface.parse(original.readlines()) == NetworkInterface.parse(converted.readlines())
+
+
+def test_query_with_several_thresholds(runner):
+    result = runner.invoke(app, [
+        "-t", PROJECT_ROOT / "examples/kbmonk1.network",
+        "query",
+        "l3_1#l1_1#>=#0.2#<#0.5",
+        "-s", "never",
+    ])
+    assert result.exit_code == 0
+    assert ">= 0.2: FALSE" in result.stdout
+    assert "< 0.5: TRUE" in result.stdout
+
+
+def test_sweep_val_phi_files(runner):
+    result = runner.invoke(app, [
+        "-t", PROJECT_ROOT / "examples/small-5.graph",
+        "sweep",
+        str(PROJECT_ROOT / "examples/1.valphi"),
+        str(PROJECT_ROOT / "examples/3.valphi"),
+        "--workers", "1",
+    ])
+    assert result.exit_code == 0
+    assert "Solutions" in result.stdout
+    assert "64" in result.stdout
+
+
+def test_plan_of_hybrid_mode(runner):
+    result = runner.invoke(app, [
+        "-t", PROJECT_ROOT / "examples/kbmonk1.network",
+        "--weight-constraints", "1000",
+        "--hybrid",
+        "plan",
+    ])
+    assert result.exit_code == 0
+    assert "Encoding plan" in result.stdout
+    assert "4 nodes with weight constraints, 0 with propagators" in result.stdout
+
+
+def test_query_with_portfolio(runner):
+    result = runner.invoke(app, [
+        "-t", PROJECT_ROOT / "examples/kbmonk1.network",
+        "query",
+        "l3_1#l1_1#>=#0.2",
+        "--portfolio",
+        "-s", "never",
+    ])
+    assert result.exit_code == 0
+    assert "Answered by configuration propagator" in result.stdout
+    assert "FALSE" in result.stdout
+
+
+def test_help_starts_without_loading_the_solver():
+    result = subprocess.run([sys.executable, "-X", "importtime", "-m", "valphi", "--help"], cwd=PROJECT_ROOT,
+                            capture_output=True, text=True)
+    assert result.returncode == 0
+    cumulative_times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and not line.endswith("imported package"):
+            _, cumulative_time, module = line.split("|")
+            cumulative_times[module.strip()] = int(cumulative_time)
+    for module in ["clingo", "valphi.controllers", "valphi.networks", "dumbo_asp", "webbrowser", "pydot", "distlib"]:
+        assert module not in cumulative_times
+    assert cumulative_times["valphi.cli"] < 2_000_000  # microseconds; loading the solver took several seconds
+
+
+def test_solve_projected_onto_input_nodes(runner):
+    result = runner.invoke(app, [
+        "-t", PROJECT_ROOT / "examples/small-5.graph",
+        "solve",
+        "--project-node", "a1",
+        "--project-node", "a2",
+    ])
+    assert result.exit_code == 0
+    assert "Solution 36" in result.stdout
+    assert "Solution 37" not in result.stdout
+
+
+def test_count_solutions(runner):
+    result = runner.invoke(app, [
+        "-t", PROJECT_ROOT / "examples/kbmonk1.network",
+        "count",
+    ])
+    assert result.exit_code == 0
+    assert "SOLUTIONS: 432" in result.stdout
+
+
+def test_count_solutions_with_workers(runner):
+    result = runner.invoke(app, [
+        "-t", PROJECT_ROOT / "examples/small-5.graph",
+        "count",
+        "--workers", "2",
+    ])
+    assert result.exit_code == 0
+    assert "SOLUTIONS: 216" in result.stdout
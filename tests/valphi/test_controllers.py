@@ -1,8 +1,12 @@
+import dataclasses
+
 import pytest
 
-from valphi import utils
-from valphi.controllers import Controller
+from valphi import utils, plans
+from valphi.controllers import Controller, ParallelMode
 from valphi.networks import NetworkTopology, ArgumentationGraph, MaxSAT, EmptyNetwork
+from valphi.options import QueryEngine
+from valphi.utils import frozendict
 
 
 def parse_query(string):
@@ -279,3 +283,313 @@ def test_query_with_less_than_or_equal():
         """
     ).answer_query("a#b#<=#1")
     assert res
+
+
+def test_domain_pruning_preserves_solutions(kbmonk1):
+    simple = Controller(network=kbmonk1).find_solutions()
+    pruned = Controller(network=kbmonk1, use_domain_pruning=True).find_solutions()
+    assert set(str(x) for x in simple) == set(str(x) for x in pruned)
+
+
+@pytest.mark.parametrize("query", [
+    read_query_from_file(f"kbmonk1-{index + 1}") for index in range(7)
+])
+def test_domain_pruning_preserves_query_answers(kbmonk1, query):
+    raw_code = 'concept_inclusion(top,l1_1,">=","0.5").'
+    simple = Controller(network=kbmonk1, raw_code=raw_code).answer_query(query)
+    pruned = Controller(network=kbmonk1, raw_code=raw_code, use_domain_pruning=True).answer_query(query)
+    assert simple.true == pruned.true
+    assert simple.left_concept_value == pruned.left_concept_value
+
+
+def test_domain_pruning_with_assertions():
+    raw_code = """
+        assertion(c,a,">=","0.5").
+        assertion(c,b,"<","0.5").
+        concept_inclusion(top,d,">","0.2").
+    """
+    simple = Controller(network=EmptyNetwork(), raw_code=raw_code).find_solutions()
+    pruned = Controller(network=EmptyNetwork(), raw_code=raw_code, use_domain_pruning=True).find_solutions()
+    assert len(simple) > 0
+    assert set(str(x) for x in simple) == set(str(x) for x in pruned)
+
+
+@pytest.mark.parametrize("query", [
+    "l2_1#l1_1#>=#0.5",
+    "l2_2#l2_3#<#0.6",
+    "l1_12#l2_3#>#0.2",
+] + [read_query_from_file(f"kbmonk1-{index + 1}") for index in range(2)])
+def test_cone_of_influence_preserves_query_answers(kbmonk1, query):
+    for use_wc in [None, 1_000]:
+        simple = Controller(network=kbmonk1, use_wc=use_wc).answer_query(query)
+        sliced = Controller(network=kbmonk1, use_wc=use_wc, use_cone_of_influence=True).answer_query(query)
+        assert simple.true == sliced.true
+        assert simple.left_concept_value == sliced.left_concept_value
+
+
+@pytest.mark.parametrize("use_wc,use_ordered_encoding", [
+    (None, False), (None, True), (1_000, False), (1_000, True),
+])
+def test_session_weight_updates(use_wc, use_ordered_encoding):
+    network = NetworkTopology.parse("""
+0.5 -1 2
+3 4 -5.25
+#
+7 8 -9
+    """)
+    updated_network = NetworkTopology.parse("""
+0.5 -1 2
+3 -4 -5.25
+#
+-7 8 -9
+    """)
+    controller = Controller(network=network, use_wc=use_wc, use_ordered_encoding=use_ordered_encoding)
+    updated_controller = Controller(network=updated_network, use_wc=use_wc,
+                                    use_ordered_encoding=use_ordered_encoding)
+
+    session = controller.open_session()
+    assert set(str(x) for x in session.find_solutions()) == set(str(x) for x in controller.find_solutions())
+    session.update_weight("l2_2", "l1_1", -4)
+    session.update_bias("l3_1", -7)
+    assert set(str(x) for x in session.find_solutions()) == \
+        set(str(x) for x in updated_controller.find_solutions())
+
+    query = "l3_1#l1_1#>=#0.4"
+    session = controller.open_session(query)
+    assert session.answer_query().left_concept_value == controller.answer_query(query).left_concept_value
+    session.update_weight("l2_2", "l1_1", -4)
+    session.update_bias("l3_1", -7)
+    res = session.answer_query()
+    expected = updated_controller.answer_query(query)
+    assert res.true == expected.true
+    assert res.left_concept_value == expected.left_concept_value
+
+
+def test_session_update_of_missing_input_is_rejected(two_layers_three_nodes_network):
+    session = Controller(network=two_layers_three_nodes_network, use_wc=1_000).open_session()
+    with pytest.raises(ValueError):
+        session.update_weight("l2_1", "l2_1", 1)
+
+
+@pytest.mark.parametrize("use_wc", [None, 1_000])
+@pytest.mark.parametrize("use_ordered_encoding", [False, True])
+@pytest.mark.parametrize("query", [
+    "and(a1,and(a2,neg(a3)))#a4",
+    "a6#or(a1,a2)",
+])
+def test_query_thresholds_match_single_queries(use_wc, use_ordered_encoding, query):
+    controller = Controller(network=read_graph_from_file("small-6"), use_wc=use_wc,
+                            use_ordered_encoding=use_ordered_encoding)
+    thresholds = ["#>=#0.1", "#>=#0.5", "#<#0.5", "#<=#1", "#>#0.9"]
+    res = controller.answer_query_thresholds(query + ''.join(thresholds))
+    assert len(res) == len(thresholds)
+    for actual, threshold in zip(res, thresholds):
+        expected = controller.answer_query(query + threshold)
+        assert actual.true == expected.true
+        assert actual.witness == expected.witness
+        assert actual.left_concept_value == expected.left_concept_value
+
+
+def test_query_thresholds_on_inconsistent_knowledge_base():
+    res = Controller(
+        network=EmptyNetwork(),
+        use_wc=1_000,
+        raw_code="""
+            concept_inclusion(top,c,">=","1.0").
+            assertion(c,a,"<=","0").
+        """
+    ).answer_query_thresholds("c#d#>=#1.0#<#0.5")
+    assert len(res) == 2
+    assert all(not result.consistent_knowledge_base for result in res)
+
+
+@pytest.mark.parametrize("query_engine", [QueryEngine.BINARY, QueryEngine.DESCENDING])
+@pytest.mark.parametrize("use_ordered_encoding", [False, True])
+def test_search_query_engines_agree_with_optimization(query_engine, use_ordered_encoding):
+    graph = read_graph_from_file("small-6")
+    controller = Controller(network=graph, use_ordered_encoding=use_ordered_encoding)
+    search = dataclasses.replace(controller, query_engine=query_engine)
+    for query in small_graph_6_queries():
+        actual, expected = search.answer_query(query), controller.answer_query(query)
+        assert actual.true == expected.true
+        assert actual.left_concept_value == expected.left_concept_value
+        assert actual.witness == expected.witness
+    query = "and(a1,and(a2,neg(a3)))#a4#>=#0.1#<#0.5#>#0.9"
+    assert [(x.true, x.witness) for x in search.answer_query_thresholds(query)] == \
+           [(x.true, x.witness) for x in controller.answer_query_thresholds(query)]
+
+
+@pytest.mark.parametrize("query_engine", [QueryEngine.BINARY, QueryEngine.DESCENDING])
+@pytest.mark.parametrize("instance", ["php-4-1-odd", "php-4-2-even"])
+def test_search_query_engines_on_max_sat(query_engine, instance):
+    network = read_cnf_from_file(instance)
+    res = Controller(network=network, val_phi=network.val_phi, query_engine=query_engine).answer_query("even")
+    assert res.true == instance.endswith("even")
+
+
+def test_search_query_engine_on_inconsistent_knowledge_base():
+    res = Controller(
+        network=EmptyNetwork(),
+        use_wc=1_000,
+        query_engine=QueryEngine.BINARY,
+        raw_code="""
+            concept_inclusion(top,c,">=","1.0").
+            assertion(c,a,"<=","0").
+        """
+    ).answer_query("c#d#>=#1.0")
+    assert not res.consistent_knowledge_base
+
+
+@pytest.mark.parametrize("parallel_mode", list(ParallelMode))
+@pytest.mark.parametrize("use_ordered_encoding", [False, True])
+def test_threads_preserve_solutions_and_query_answers(parallel_mode, use_ordered_encoding):
+    graph = read_graph_from_file("small-6")
+    controller = Controller(network=graph, use_ordered_encoding=use_ordered_encoding)
+    threaded = Controller(network=graph, use_ordered_encoding=use_ordered_encoding, threads=3,
+                          parallel_mode=parallel_mode)
+    assert set(str(x) for x in threaded.find_solutions()) == set(str(x) for x in controller.find_solutions())
+    for query in small_graph_6_queries():
+        actual, expected = threaded.answer_query(query), controller.answer_query(query)
+        assert actual.true == expected.true
+        assert actual.left_concept_value == expected.left_concept_value
+
+
+@pytest.fixture
+def non_crisp_network():
+    return NetworkTopology()\
+        .add_layer()\
+        .add_node()\
+        .add_node()\
+        .add_node()\
+        .add_node()\
+        .add_layer()\
+        .add_node([1, 2, -3, 1, 0])\
+        .add_node([-2, 1, 1, -1, 3])\
+        .add_node([0, -2, 2, 2, -1])\
+        .add_layer()\
+        .add_node([-1, 3, -2, 2])\
+        .complete()
+
+
+@pytest.mark.parametrize("use_ordered_encoding", [False, True])
+def test_propagator_bounds_agree_with_weight_constraints(non_crisp_network, use_ordered_encoding):
+    val_phi = [-2, 0, 2]
+    propagator = Controller(network=non_crisp_network, val_phi=val_phi, use_ordered_encoding=use_ordered_encoding)
+    wc = Controller(network=non_crisp_network, val_phi=val_phi, use_wc=1, use_ordered_encoding=use_ordered_encoding)
+    assert set(str(x) for x in propagator.find_solutions()) == set(str(x) for x in wc.find_solutions())
+    for query in ["l3_1#l1_1#>=#0.6", "l3_1#l2_2#<#0.4", "l2_1#l2_3#>#0.3"]:
+        actual, expected = propagator.answer_query(query), wc.answer_query(query)
+        assert actual.true == expected.true
+        assert actual.left_concept_value == expected.left_concept_value
+
+
+@pytest.mark.parametrize("use_ordered_encoding", [False, True])
+@pytest.mark.parametrize("raw_code", [
+    """
+        assertion(l2_1,a,">=","0.6").
+        assertion(l1_2,b,"<=","0.4").
+        assertion(l3_1,b,">","0.2").
+    """,
+    """
+        concept_inclusion(l1_1,l3_1,"<","0.5").
+        concept_inclusion(l2_2,l1_3,"<=","0.6").
+    """,
+])
+def test_propagator_with_individuals_agrees_with_weight_constraints(non_crisp_network, use_ordered_encoding, raw_code):
+    val_phi = [-2, 0, 2]
+    propagator = Controller(network=non_crisp_network, val_phi=val_phi, raw_code=raw_code,
+                            use_ordered_encoding=use_ordered_encoding)
+    wc = Controller(network=non_crisp_network, val_phi=val_phi, raw_code=raw_code, use_wc=1,
+                    use_ordered_encoding=use_ordered_encoding)
+    solutions = set(str(x) for x in propagator.find_solutions())
+    assert solutions
+    assert solutions == set(str(x) for x in wc.find_solutions())
+    for query in ["l3_1#l1_1#>=#0.6", "l3_1#l2_2#<#0.4", "l2_1#l2_3#>#0.3"]:
+        actual, expected = propagator.answer_query(query), wc.answer_query(query)
+        assert actual.true == expected.true
+        assert actual.left_concept_value == expected.left_concept_value
+
+
+@pytest.mark.parametrize("propagator_nodes", [set(), {"l2_2"}, {"l2_1", "l3_1"}, {"l2_1", "l2_2", "l2_3", "l3_1"}])
+@pytest.mark.parametrize("use_ordered_encoding", [False, True])
+def test_hybrid_agrees_with_weight_constraints(non_crisp_network, use_ordered_encoding, propagator_nodes,
+                                               monkeypatch):
+    def plan_nodes(*args, **kwargs):
+        return [dataclasses.replace(node, weight_constraint_size=1, propagator_cost=0)
+                if node.node in propagator_nodes else node for node in plans.plan_nodes(*args, **kwargs)]
+    monkeypatch.setattr("valphi.controllers.plan_nodes", plan_nodes)
+
+    val_phi = [-1.5, 0, 1.75]
+    hybrid = Controller(network=non_crisp_network, val_phi=val_phi, use_wc=4, use_hybrid=True,
+                        use_ordered_encoding=use_ordered_encoding)
+    wc = Controller(network=non_crisp_network, val_phi=val_phi, use_wc=4, use_ordered_encoding=use_ordered_encoding)
+    assert {node.node for node in hybrid.encoding_plan() if not node.use_weight_constraints} == propagator_nodes
+    assert set(str(x) for x in hybrid.find_solutions()) == set(str(x) for x in wc.find_solutions())
+    for query in ["l3_1#l1_1#>=#0.6", "l3_1#l2_2#<#0.4", "l2_1#l2_3#>#0.3"]:
+        actual, expected = hybrid.answer_query(query), wc.answer_query(query)
+        assert actual.true == expected.true
+        assert actual.left_concept_value == expected.left_concept_value
+
+
+def test_encoding_plan_prefers_propagators_for_many_truth_degrees(non_crisp_network):
+    def plan(max_value):
+        val_phi = [float(value) for value in range(max_value)]
+        return {node.node: node for node in Controller(network=non_crisp_network, val_phi=val_phi,
+                                                       use_wc=1).encoding_plan()}
+
+    few, many = plan(3), plan(1000)
+    assert few["l2_2"].fan_in == 5
+    assert few["l2_3"].fan_in == 4
+    assert all(node.use_weight_constraints for node in few.values())
+    assert not any(node.use_weight_constraints for node in many.values())
+
+
+def test_hybrid_requires_multiplier(non_crisp_network):
+    with pytest.raises(ValueError):
+        Controller(network=non_crisp_network, use_hybrid=True)
+    with pytest.raises(ValueError):
+        Controller(network=non_crisp_network, use_wc=1000, use_hybrid=True).open_session()
+
+
+@pytest.mark.parametrize("graph", [read_graph_from_file(f"small-{index}") for index in [2, 5, 6]])
+@pytest.mark.parametrize("use_wc", [None, 1000])
+def test_projected_solutions_are_restrictions_of_solutions(graph, use_wc):
+    controller = Controller(network=graph, use_wc=use_wc)
+    projection = graph.input_nodes()
+    solutions = controller.find_solutions()
+    projected = controller.find_solutions(projection=projection)
+    assert len(projected) == len(set(projected))
+    assert set(projected) == set(frozendict({key: value for key, value in solution.items() if key in projection})
+                                 for solution in solutions)
+    for solution in projected[:3]:
+        expanded = controller.expand_solution(solution, projection)
+        assert expanded in solutions
+        assert all(expanded[key] == value for key, value in solution.items())
+
+
+def test_projection_on_unknown_node_is_rejected(two_layers_three_nodes_network):
+    with pytest.raises(ValueError):
+        Controller(network=two_layers_three_nodes_network).find_solutions(projection=["l1_1", "l9_9"])
+
+
+@pytest.mark.parametrize("graph", [read_graph_from_file(f"small-{index}") for index in [2, 5, 6]])
+def test_count_solutions_matches_enumeration(graph):
+    controller = Controller(network=graph)
+    res = controller.count_solutions()
+    assert res.complete
+    assert res.count == len(controller.find_solutions())
+    res = controller.count_solutions(projection=graph.input_nodes())
+    assert res.complete
+    assert res.count == len(controller.find_solutions(projection=graph.input_nodes()))
+
+
+def test_count_solutions_of_max_sat():
+    res = Controller(network=read_cnf_from_file("php-4-1-odd"),
+                     val_phi=read_cnf_from_file("php-4-1-odd").val_phi).count_solutions()
+    assert res == Controller.SolutionCount(count=16, complete=True)
+
+
+def test_interrupted_count_is_a_lower_bound(kbmonk1):
+    res = Controller(network=kbmonk1).count_solutions(timeout=0)
+    assert not res.complete
+    assert 0 <= res.count < 432
@@ -0,0 +1,43 @@
+import pytest
+
+from valphi import utils
+from valphi.controllers import Controller
+from valphi.cubes import make_cubes, find_solutions, count_solutions
+from valphi.networks import ArgumentationGraph, NetworkTopology
+
+
+@pytest.fixture
+def graph():
+    with open(utils.PROJECT_ROOT / "examples/small-5.graph") as f:
+        return ArgumentationGraph.parse(f.readlines())
+
+
+@pytest.fixture
+def kbmonk1():
+    with open(utils.PROJECT_ROOT / "examples/kbmonk1.network") as f:
+        return NetworkTopology.parse(f.readlines())
+
+
+def test_cubes_split_exactly_one_groups_on_their_true_element(kbmonk1):
+    controller = Controller(network=kbmonk1)
+    cubes = make_cubes(controller, 3)
+    group = [kbmonk1.term(1, node) for node in kbmonk1.nodes_in_exactly_one(0)]
+    assert cubes == [[(node, controller.max_value)] for node in group]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_cubes_preserve_solutions_and_their_order(graph, max_workers):
+    controller = Controller(network=graph)
+    expected = controller.find_solutions()
+    res = list(find_solutions(controller, max_workers=max_workers, number_of_cubes=8))
+    assert sorted(str(x) for x in res) == sorted(str(x) for x in expected)
+    assert res == list(find_solutions(controller, max_workers=1, number_of_cubes=8))
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_cubes_preserve_counts(kbmonk1, max_workers):
+    controller = Controller(network=kbmonk1)
+    assert count_solutions(controller, max_workers=max_workers) == 432
+    projection = ["l1_1", "l2_1"]
+    assert count_solutions(controller, projection=projection, max_workers=max_workers) == \
+        controller.count_solutions(projection=projection).count
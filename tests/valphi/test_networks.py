@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 from dumbo_utils.validation import ValidationError
 
@@ -119,3 +120,138 @@ weighted_typicality_inclusion(l2_1,l1_1,"-5").
 weighted_typicality_inclusion(l2_1,l1_2,"10").
 weighted_typicality_inclusion(l2_1,top,"6").
     """.strip()
+
+
+def test_add_weights_as_matrix():
+    network = NetworkTopology() \
+        .add_layer() \
+        .add_node() \
+        .add_node() \
+        .add_weights(np.array([[20, -10]]), np.array([10])) \
+        .complete()
+    assert network == two_layers_three_nodes_network()
+    assert network.layer_weights(layer=2).shape == (1, 2)
+    assert network.layer_bias(layer=2).tolist() == [10]
+
+
+def test_add_weights_must_match_previous_layer():
+    with pytest.raises(ValidationError):
+        NetworkTopology().add_layer().add_node().add_weights(np.array([[1, 2]]), np.array([0]))
+
+
+def test_parse_network_with_several_layers():
+    network = NetworkInterface.parse("""
+1 2 3
+4 5 6
+#
+7 8 9
+crisp 2
+    """)
+    assert network.number_of_layers() == 3
+    assert network.number_of_nodes(layer=1) == 2
+    assert network.number_of_nodes(layer=2) == 2
+    assert network.number_of_nodes(layer=3) == 1
+    assert network.in_weights(layer=2, node=2) == [4, 5, 6]
+    assert network.in_weights(layer=3, node=1) == [7, 8, 9]
+    assert network.is_crisp_layer(2)
+    assert not network.is_crisp_layer(3)
+
+
+def test_sparse_layer_only_lists_stored_weights():
+    sparse = pytest.importorskip("scipy.sparse")
+    network = NetworkTopology() \
+        .add_layer() \
+        .add_node() \
+        .add_node() \
+        .add_weights(sparse.csr_matrix([[0, 2.5]]), np.array([1])) \
+        .complete()
+    assert network.in_weights(layer=2, node=1) == [1, 0, 2.5]
+    assert network.network_facts.as_facts == """
+weighted_typicality_inclusion(l2_1,l1_2,"2.5").
+weighted_typicality_inclusion(l2_1,top,"1").
+    """.strip()
+
+
+def test_binary_network_round_trip(tmp_path):
+    network = NetworkInterface.parse("""
+0.5 -1 2
+3 4 -5.25
+#
+7 8 9
+=1 1 2
+crisp 1
+    """)
+    network.save_binary(tmp_path / "network.bin")
+    loaded = NetworkInterface.parse(tmp_path / "network.bin")
+    assert loaded == network
+    assert isinstance(loaded.layer_weights(layer=2), np.memmap)
+    assert loaded.network_facts == network.network_facts
+
+
+def test_binary_graph_round_trip(tmp_path):
+    graph = NetworkInterface.parse("""
+#graph
+1 2 0.5
+2 1 -1
+    """)
+    graph.save_binary(tmp_path / "graph.bin")
+    assert NetworkInterface.parse(tmp_path / "graph.bin").network_facts == graph.network_facts
+
+
+def test_serialize_network_as_text():
+    text = "0.5 -1 2\n3 4 -5.25\n#\n7 8 9\n=1 1 2\ncrisp 1\n"
+    assert NetworkInterface.parse(text).serialize() == text
+
+
+def test_propagate_bounds_through_layers():
+    network = NetworkInterface.parse("""
+0 1 1
+#
+-1 2
+    """)
+    val_phi = [0, 1, 2]
+    assert network.propagate_bounds(val_phi, {}) == {
+        "l1_1": (0, 3), "l1_2": (0, 3), "l2_1": (0, 3), "l3_1": (0, 3),
+    }
+    bounds = network.propagate_bounds(val_phi, {"l1_1": (0, 0), "l1_2": (0, 1)})
+    assert bounds["l2_1"] == (0, 1)
+    assert bounds["l3_1"] == (0, 0)
+
+
+def test_propagate_bounds_in_cyclic_graph():
+    graph = NetworkInterface.parse("""
+#graph
+1 2 1
+2 3 1
+3 2 -1
+    """)
+    bounds = graph.propagate_bounds([0, 1, 2], {"a1": (0, 0)})
+    assert bounds["a1"] == (0, 0)
+    assert bounds["a2"] == (0, 0)
+    assert bounds["a3"] == (0, 0)
+
+
+def test_cone_of_influence():
+    network = NetworkInterface.parse("""
+1 2 0
+3 0 4
+#
+5 6 0
+=1 1 2
+    """)
+    cone = network.cone_of_influence({"l3_1"})
+    assert cone.is_active(layer=3, node=1)
+    assert cone.is_active(layer=2, node=1)
+    assert not cone.is_active(layer=2, node=2)
+    assert cone.is_active(layer=1, node=1)
+    assert cone.is_active(layer=1, node=2)
+    facts = cone.network_facts.as_facts
+    assert "l2_2" not in facts
+    assert 'weighted_typicality_inclusion(l2_1,l1_1,"2").' in facts
+    assert 'weighted_typicality_inclusion(l2_1,l1_2,"0").' in facts
+    assert "exactly_one(0)." in facts
+
+    cone = network.cone_of_influence({"l2_2"})
+    assert not cone.is_active(layer=3, node=1)
+    assert not cone.is_active(layer=2, node=1)
+    assert cone.is_active(layer=1, node=1)
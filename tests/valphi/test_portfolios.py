@@ -0,0 +1,45 @@
+import pytest
+
+from valphi import utils
+from valphi.controllers import Controller
+from valphi.networks import ArgumentationGraph
+from valphi.portfolios import answer_query, default_portfolio
+
+
+def read_query(filename):
+    with open(utils.PROJECT_ROOT / f"examples/{filename}.query") as f:
+        return ''.join(x.strip() for x in f.readlines())
+
+
+@pytest.fixture
+def graph():
+    with open(utils.PROJECT_ROOT / "examples/small-5.graph") as f:
+        return ArgumentationGraph.parse(f.readlines())
+
+
+@pytest.mark.parametrize("use_wc", [None, 1_000])
+def test_portfolio_answers_as_its_controller(graph, use_wc):
+    controller = Controller(network=graph, use_wc=use_wc)
+    configurations = default_portfolio(controller)
+    assert len(configurations) == (4 if use_wc is None else 8)
+    for index in range(5):
+        query = read_query(f"small-5-{index + 1}")
+        res = answer_query(configurations, query)
+        expected = controller.answer_query(query)
+        assert res.configuration in [label for label, _ in configurations]
+        assert res.answer.true == expected.true
+        assert res.answer.left_concept_value == expected.left_concept_value
+
+
+def test_portfolio_ignores_failing_configurations(graph):
+    controller = Controller(network=graph)
+    res = answer_query([("broken", Controller(network=graph, clingo_arguments=["--no-such-option"])),
+                        ("default", controller)], read_query("small-5-1"))
+    assert res.configuration == "default"
+    assert res.answer.true == controller.answer_query(read_query("small-5-1")).true
+
+
+def test_portfolio_fails_if_all_configurations_fail(graph):
+    with pytest.raises(RuntimeError):
+        answer_query([("broken", Controller(network=graph, clingo_arguments=["--no-such-option"]))],
+                     read_query("small-5-1"))
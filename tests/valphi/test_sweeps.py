@@ -0,0 +1,50 @@
+import dataclasses
+
+import pytest
+
+from valphi import utils
+from valphi.controllers import Controller
+from valphi.networks import ArgumentationGraph
+from valphi.sweeps import sweep
+
+
+def read_val_phi(filename):
+    with open(utils.PROJECT_ROOT / f"examples/{filename}.valphi") as f:
+        return [float(x) for x in f.readlines() if x]
+
+
+@pytest.fixture
+def graph():
+    with open(utils.PROJECT_ROOT / "examples/small-5.graph") as f:
+        return ArgumentationGraph.parse(f.readlines())
+
+
+@pytest.fixture
+def val_phis():
+    return [(name, read_val_phi(name)) for name in ["1", "3", "5"]] + [("5-shifted", [-12, -5, -1, 3, 9])]
+
+
+@pytest.mark.parametrize("use_wc", [None, 1_000])
+def test_sweep_counts_solutions_of_each_val_phi(graph, val_phis, use_wc):
+    controller = Controller(network=graph, use_wc=use_wc)
+    res = sweep(controller, val_phis, max_workers=1)
+    assert [result.label for result in res] == [label for label, _ in val_phis]
+    for result, (_, val_phi) in zip(res, val_phis):
+        assert result.max_value == len(val_phi)
+        assert result.number_of_solutions == len(dataclasses.replace(controller, val_phi=val_phi).find_solutions())
+
+
+def test_sweep_answers_query_of_each_val_phi(graph, val_phis):
+    controller = Controller(network=graph)
+    query = "a6#or(a1,a2)#>=#0.1"
+    res = sweep(controller, val_phis, query, max_workers=2)
+    for result, (_, val_phi) in zip(res, val_phis):
+        expected = dataclasses.replace(controller, val_phi=val_phi).answer_query(query)
+        assert result.true == expected.true
+        assert result.left_concept_value == expected.left_concept_value
+
+
+def test_session_val_phi_cannot_change_the_number_of_truth_degrees(graph):
+    session = Controller(network=graph).open_session()
+    with pytest.raises(ValueError):
+        session.update_val_phi(read_val_phi("3"))
@@ -1,22 +1,24 @@
 import dataclasses
-import webbrowser
+import itertools
 from enum import Enum
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, TYPE_CHECKING
 
 import typer
-from dumbo_asp.queries import pack_asp_chef_url
 from dumbo_utils.console import console
-from dumbo_utils.validation import validate
-from rich.table import Table
 
-from valphi.controllers import Controller
-from valphi.networks import NetworkTopology, ArgumentationGraph, MaxSAT, NetworkInterface
+from valphi.options import ParallelMode, DEFAULT_VAL_PHI, QueryEngine
+
+# the solver and the optional dependencies are imported by the commands using them, to keep --help fast
+if TYPE_CHECKING:
+    from rich.table import Table
+
+    from valphi.controllers import Controller
 
 
 @dataclasses.dataclass(frozen=True)
 class AppOptions:
-    controller: Optional[Controller] = dataclasses.field(default=None)
+    controller: Optional["Controller"] = dataclasses.field(default=None)
     debug: bool = dataclasses.field(default=False)
 
 
@@ -26,6 +28,11 @@ class ShowSolutionOption(str, Enum):
     NEVER = "never"
 
 
+class NetworkFormat(str, Enum):
+    TEXT = "text"
+    BINARY = "binary"
+
+
 app_options = AppOptions()
 app = typer.Typer()
 
@@ -50,7 +57,7 @@ def main(
             None,
             "--val-phi",
             "-v",
-            help=f"File containing the ValPhi function (default to {Controller.default_val_phi()})",
+            help=f"File containing the ValPhi function (default to {list(DEFAULT_VAL_PHI)})",
         ),
         network_filename: Path = typer.Option(
             ...,
@@ -69,7 +76,37 @@ def main(
             help="Use weight constraints instead of ad-hoc propagator. "
                  "It also requires a multiplier to approximate real numbers."
         ),
+        hybrid: bool = typer.Option(
+            False,
+            help="Choose between weight constraints and propagators for each node, according to their estimated cost "
+                 "(requires --weight-constraints)",
+        ),
         ordered: bool = typer.Option(False, help="Add ordered encoding for eval/3"),
+        prune_domains: bool = typer.Option(
+            False,
+            help="Restrict the truth degrees of each node to those reachable according to interval arithmetic",
+        ),
+        slice_queries: bool = typer.Option(
+            False,
+            help="Answer queries on the sub-network the query depends on (the printed solution is partial)",
+        ),
+        threads: int = typer.Option(1, "--threads", help="Number of solver threads"),
+        parallel_mode: ParallelMode = typer.Option(
+            ParallelMode.COMPETE,
+            case_sensitive=False,
+            help="How threads cooperate: competing on the whole search space, or splitting it",
+        ),
+        clingo_arguments: List[str] = typer.Option(
+            [],
+            "--clingo-argument",
+            help="Argument passed to clingo (can be repeated), for example --clingo-argument=--opt-strategy=usc",
+        ),
+        query_engine: QueryEngine = typer.Option(
+            QueryEngine.OPTIMIZATION,
+            case_sensitive=False,
+            help="How queries find the maximal typical truth degree: multi-level optimization, or binary or "
+                 "descending search with assumptions followed by a satisfiability check for a witness",
+        ),
         debug: bool = typer.Option(False, "--debug", help="Show stacktrace and debug info"),
 ):
     """
@@ -79,27 +116,25 @@ def main(
     """
     global app_options
 
+    from dumbo_utils.validation import validate
+
+    from valphi.controllers import Controller
+    from valphi.networks import MaxSAT, NetworkInterface
+
     validate('network_filename', network_filename.exists() and network_filename.is_file(), equals=True,
              help_msg=f"File {network_filename} does not exists")
     for filename in filenames:
         validate('filenames', filename.exists() and filename.is_file(), equals=True,
                  help_msg=f"File {filename} does not exists")
 
-    val_phi = Controller.default_val_phi()
-    if val_phi_filename is not None:
-        validate('val_phi_filename', val_phi_filename.exists() and val_phi_filename.is_file(), equals=True,
-                 help_msg=f"File {val_phi_filename} does not exists")
-        with open(val_phi_filename) as f:
-            val_phi = [float(x) for x in f.readlines() if x]
+    val_phi = Controller.default_val_phi() if val_phi_filename is None else read_val_phi(val_phi_filename)
 
     lines = []
     for filename in filenames:
         with open(filename) as f:
             lines += f.readlines()
 
-    with open(network_filename) as f:
-        network_filename_lines = f.readlines()
-        network = NetworkInterface.parse(network_filename_lines)
+    network = NetworkInterface.parse(network_filename)
 
     if type(network) is MaxSAT:
         validate("val_phi cannot be changed for MaxSAT", val_phi_filename is None, equals=True)
@@ -111,6 +146,13 @@ def main(
         raw_code='\n'.join(lines),
         use_wc=weight_constraints,
         use_ordered_encoding=ordered,
+        use_domain_pruning=prune_domains,
+        use_cone_of_influence=slice_queries,
+        threads=threads,
+        parallel_mode=parallel_mode,
+        use_hybrid=hybrid,
+        clingo_arguments=clingo_arguments,
+        query_engine=query_engine,
     )
 
     app_options = AppOptions(
@@ -119,7 +161,28 @@ def main(
     )
 
 
-def network_values_to_table(values: Dict, *, title: str = "") -> Table:
+def read_val_phi(filename: Path) -> List[float]:
+    from dumbo_utils.validation import validate
+
+    validate('val_phi_filename', filename.exists() and filename.is_file(), equals=True,
+             help_msg=f"File {filename} does not exists")
+    with open(filename) as f:
+        return [float(x) for x in f.readlines() if x]
+
+
+def read_projection(project: bool, project_nodes: List[str]) -> Optional[List[str]]:
+    if project_nodes:
+        return project_nodes
+    if project:
+        return app_options.controller.network.input_nodes()
+    return None
+
+
+def network_values_to_table(values: Dict, *, title: str = "") -> "Table":
+    from rich.table import Table
+
+    from valphi.networks import NetworkTopology, ArgumentationGraph, MaxSAT
+
     network = app_options.controller.network
     table = Table(title=title)
     if type(network) is NetworkTopology:
@@ -133,7 +196,7 @@ def network_values_to_table(values: Dict, *, title: str = "") -> Table:
         for node_index, _ in enumerate(range(max_nodes), start=1):
             table.add_row(
                 str(node_index),
-                *(str(values[(layer_index, node_index)])
+                *(str(values.get((layer_index, node_index), "-"))
                   if node_index <= network.number_of_nodes(layer_index) else None
                   for layer_index, _ in enumerate(range(network.number_of_layers()), start=1))
             )
@@ -143,7 +206,7 @@ def network_values_to_table(values: Dict, *, title: str = "") -> Table:
         for node, _ in enumerate(network.arguments, start=1):
             table.add_row(
                 str(node),
-                str(values[f"{network.term(node)}"]),
+                str(values.get(f"{network.term(node)}", "-")),
             )
     elif type(network) is MaxSAT:
         table.add_column("# of satisfied clauses / Atom / Clause")
@@ -173,19 +236,54 @@ def command_solve(
             default=False,
             help="Open solutions with ASP Chef",
         ),
+        project: bool = typer.Option(
+            False,
+            help="Enumerate the distinct assignments of the input nodes (or of the nodes given by --project-node)",
+        ),
+        project_nodes: List[str] = typer.Option(
+            [],
+            "--project-node",
+            help="Node to project solutions onto (can be repeated; it implies --project)",
+        ),
+        expand: bool = typer.Option(
+            False,
+            help="Extend each projected solution to all nodes",
+        ),
+        workers: Optional[int] = typer.Option(
+            None,
+            "--workers",
+            "-w",
+            help="Split the search space into cubes, solved by this number of processes",
+        ),
 ) -> None:
     """
     Run the program and print solutions.
     """
+    from dumbo_utils.validation import validate
+
     validate('number_of_solutions', number_of_solutions, min_value=0)
 
+    projection = read_projection(project, project_nodes)
+    validate("expand", expand and projection is None, equals=False, help_msg="Use --expand with --project")
+
     with console.status("Running..."):
-        res = app_options.controller.find_solutions(number_of_solutions)
+        if workers is None:
+            res = app_options.controller.find_solutions(number_of_solutions, projection=projection)
+        else:
+            from valphi import cubes
+
+            res = list(itertools.islice(cubes.find_solutions(app_options.controller, projection, max_workers=workers),
+                                        number_of_solutions or None))
+        if expand:
+            res = [app_options.controller.expand_solution(values, projection) for values in res]
     if not res:
         console.print('NO SOLUTIONS')
     for index, values in enumerate(res, start=1):
         console.print(network_values_to_table(values, title=f"Solution {index}"))
     if show_in_asp_chef:
+        import webbrowser
+        from dumbo_asp.queries import pack_asp_chef_url
+
         url = "https://asp-chef.alviano.net/"
         # url = "http://localhost:5188/"
         url += "#eJy9V1uXqjga/Utc9HTz0A8qF6MkjIBA8iZw5BbEbrS4/Pr+glaVnnLOzJrTax5q1ZKQnXyXvffH92Fzjk9LOV2hb+GAisjrChbOy1hxeaTwa7IOJFSeaxr2IxNrVnBf0+R0fduXrjeyWEuU/C2VtYaFffe45/78LbGCgUbuOVbm44v1cyxrHQ3nPP6KeY7rdGChe4a7SRGcn1rmOV7jwjm5QxruW3TacBq6b3Hdz8W9mbrhzOI8PrniLCk5BdxebcaDpak/rB8PVpBDXEMyoG+sNttEEXjLPI0IxLnJD+L9pzU4S+Ed8yBnalscwl3hFEhyAAePaU0KqcMWUmzfrWhoXBwfz5knKbTMBloaimPtFUenBdznISczwNj4kDtO1V3mh1rFwu72zvojZ7+hE5FidVE4NcvjNREx5cl62X73fsjZ8Pk7nrD64yGcVyzKCqc0nvL1np9jJLXfoR8Y5B+VhOMQDVShc9tfVlihF6KbBS7kHCtohGclLUnt6Ggk46LDA2pRrXUs2uSpxd/iAjCqXqbecmFHLk9qeUQF3EVdSodQu4pcw1ljamlPvUKjZRevq4e6kiZWk5d1ftx3sHjFAtF7JsSIHvMDz/jpsIYalajDKzhD0a6pFVxF76KayXFNpjuhNTkzRX47hO51u85aZM3OkTXL0Bpl//KWEtRAjsMNT4p8ZkMdklr0BU/iYpElxUJDuvG21Y2/4tCUDqs5/75eNHaEztugv6LVcmCRKyf1LLuv17EFnCjyAa2aLC7m1zSUC7h7th0WnV3u4WzgQr0TPQD/yRv06DFZT31bQs9wVDZFJGuQM8JJ6R6jYaMdvf43VPNKrBE9r52QQG/vLsRPRlxIEtPT2g43Na3xhY5Gj8PdjJS8cnyoyK0+UCvzlg/A2CtBntSkQYYszm+Te52nGp8E/9oiUd23ZPXAj9rsEuuzr9559/D7S03gecsiLDhw2lpzOGvf7LwKatDntA7arWGc7dUStKefcsYU1OByL2+L3LEDeralWQs4A/H3fwaF5my96oz05oKsQKFhB1j90TapwLjQKD+mcFfop8YvqivkOYnrpIlr4ImXL7del7FT1oSrxZ9Ipx1gZU4hZXf+CCy69V7tqZrQe94TW+Ycair2sGkP76Fn8haw/oKY2l3xEKOZnLfe4pvtgfas3Zwqrdi3suE53HuFVoaG1iLX97Mtfj0M+dI20P+YG1MCHS3vGG0wwF0MlCFfygQvATNEupTtHnlhJq0/3VnOv5sa5LYHjcmdh9hAa1iehr2UDF025SfQBuDsOY1wg/29uOt18hDVBY64R+BjG6uoSZX8nFoP6wqDHts10QrNknUGvNGusUrAI0CXV8Arbya48c6bd13LD8CHJy2vbz4WKeYYKQQwBXfBP27e8NXb1OXkNVQxJaHxiGtHWpsj86kUyb9PfKSgsZESXOHuEO8Uw4em3M4NnrjIysUIWqoyHYEf0DlbSRIdl4XtZwoJ9xcyLjkLA05qOuARv+Siq4LWW9k/4gngeVDTHLy9UbC+gBzNb/pSm9UhCgC3GSZe/qA3bOJ/UB6s3x81mtNoUx6Enhbo87ep3XsSnp/Aa61e3OFxXWJRLk01sbRB4Cd1UKGTrNnrD1+VsZ7NiEU45KxzdEMCX+XYxxfHMiQySDNH5zkNd70TGvCHf+qr+4d4flHLPueXZ0yYozZc6AviksCXINfDU08JneOX9NlvcYd90Gs9gfioihXjQizas5VckJKC3yKZ+ODJ1n5Ox4VKvBd+y8lbctpl9FQ9xYlEbg1zYGpwEfPTL/nwZ4+NsbqRplnKCmZQux6egT6SEs6oQN9OH3jRUz1VYrkF1iGWlVwyHbzOdwuo24WW4N2eNKfKTsaWoUI+ClyjV/XcxDVox+qfr9/dU88Tvqkdn3txUzs+zHkhHrAn1+Cro5jxiL670BrJjognDCpW8pooWCL+v+tFE+aq7D7j9b82F/1kznnw1CNwTPAPZoR8Y+vgO3d/eox1a1TwPuCtwA9MKnT+bIOmwzsQV9+C9jWe1w3CRyf/gD03T8xvuJ9eG9rG7HzzBNBOJWjjOz4eeufuccf33rnh9hNnhCcGhXhH+PLP9f1Dy8J5l0agwRGZdBh6APyGX1PxffCZH8j1fzNDveubdnz/DmKTjs2liTsvexqw/arHYt4Xs3+ZFx89XbsF6FYPvc3F3E981JPQeNUXa8Cf9J55S30v01/S+S/e98rT7nUR/Qe5aWLRC/dvwc9vHci1ZYp73nScu8tdMeXo5n2B1gnNPsCcCd597zW4lwKxfuVPhS3cEYVVeJBr7BuD7e965ifAfWMO82nv6JscdB34H5SkfMn9/7eWP8fzHzVdTo+7P/74GzQZS9M=%21"
@@ -204,11 +302,58 @@ def command_solve(
         webbrowser.open(url, new=0, autoraise=True)
 
 
+@app.command(name="count")
+def command_count(
+        project: bool = typer.Option(
+            False,
+            help="Count the distinct assignments of the input nodes (or of the nodes given by --project-node)",
+        ),
+        project_nodes: List[str] = typer.Option(
+            [],
+            "--project-node",
+            help="Node to project solutions onto (can be repeated; it implies --project)",
+        ),
+        timeout: Optional[float] = typer.Option(
+            None,
+            "--timeout",
+            help="Interrupt the search after this number of seconds, and report a lower bound",
+        ),
+        workers: Optional[int] = typer.Option(
+            None,
+            "--workers",
+            "-w",
+            help="Split the search space into cubes, solved by this number of processes (no timeout)",
+        ),
+) -> None:
+    """
+    Count solutions without printing them.
+    """
+    from dumbo_utils.validation import validate
+
+    validate("timeout", timeout is not None and workers is not None, equals=False,
+             help_msg="Option --timeout cannot be used with --workers")
+    with console.status("Running..."):
+        if workers is None:
+            res = app_options.controller.count_solutions(read_projection(project, project_nodes), timeout=timeout)
+            count, complete = res.count, res.complete
+        else:
+            from valphi import cubes
+
+            count = cubes.count_solutions(app_options.controller, read_projection(project, project_nodes),
+                                          max_workers=workers)
+            complete = True
+    if complete:
+        console.print(f"SOLUTIONS: {count}")
+    else:
+        console.print(f"SOLUTIONS: at least {count} (interrupted after {timeout} seconds)")
+
+
 @app.command(name="query")
 def command_query(
         query: Optional[str] = typer.Argument(
             None,
-            help=f"A string representing the query as an alternative to --query-filename",
+            help=f"A string representing the query as an alternative to --query-filename "
+                 f"(several comparator#threshold pairs can be given for the same concepts)",
         ),
         query_filename: Optional[Path] = typer.Option(
             None,
@@ -223,10 +368,16 @@ def command_query(
             case_sensitive=False,
             help="Enforce or inhibit the printing of the computed solution",
         ),
+        portfolio: bool = typer.Option(
+            False,
+            help="Run several configurations in parallel processes, and report the first answer",
+        ),
 ) -> None:
     """
     Answer the provided query.
     """
+    from dumbo_utils.validation import validate
+
     validate("query", query is None and query_filename is None, equals=False, help_msg="No query was given")
     validate("query", query is not None and query_filename is not None, equals=False,
              help_msg="Option --query-filename cannot be used if the query is given from the command line")
@@ -237,11 +388,128 @@ def command_query(
         with open(query_filename) as f:
             query = ''.join(x.strip() for x in f.readlines())
 
+    if portfolio:
+        from valphi import portfolios
+
+        validate("query", query.count('#') > 3, equals=False,
+                 help_msg="The portfolio does not support several thresholds")
+        with console.status("Running..."):
+            outcome = portfolios.answer_query(portfolios.default_portfolio(app_options.controller), query)
+        console.print(f"Answered by configuration {outcome.configuration} in {outcome.seconds:.3f} seconds")
+        results = [outcome.answer]
+        prefixes = [""]
+    elif query.count('#') > 3:
+        _, _, thresholds = app_options.controller.parse_query_thresholds(query)
+        with console.status("Running..."):
+            results = app_options.controller.answer_query_thresholds(query=query)
+        prefixes = [f"{comparator} {threshold}: " for comparator, threshold in thresholds]
+    else:
+        with console.status("Running..."):
+            results = [app_options.controller.answer_query(query=query)]
+        prefixes = [""]
+    for prefix, res in zip(prefixes, results):
+        title = f"{str(res.true).upper()}: typical individuals of the left concept are assigned " \
+                f"{res.left_concept_value}" if res.consistent_knowledge_base \
+            else f"TRUE: the knowledge base is inconsistent!"
+        console.print(prefix + title)
+        if show_solution == ShowSolutionOption.ALWAYS or \
+                (show_solution == ShowSolutionOption.IF_WITNESS and res.witness):
+            console.print(network_values_to_table(res.assignment))
+
+
+
+@app.command(name="sweep")
+def command_sweep(
+        val_phi_filenames: List[Path] = typer.Argument(
+            ...,
+            help="Files containing the ValPhi functions to compare",
+        ),
+        query: Optional[str] = typer.Option(
+            None,
+            "--query",
+            help="Answer this query for each ValPhi function, instead of counting solutions",
+        ),
+        workers: Optional[int] = typer.Option(
+            None,
+            "--workers",
+            "-w",
+            help="Maximum number of processes (default to the number of processors)",
+        ),
+) -> None:
+    """
+    Compare several ValPhi functions on the same network.
+    """
+    from rich.table import Table
+
+    from valphi.sweeps import sweep
+
+    val_phis = [(str(filename), read_val_phi(filename)) for filename in val_phi_filenames]
     with console.status("Running..."):
-        res = app_options.controller.answer_query(query=query)
-    title = f"{str(res.true).upper()}: typical individuals of the left concept are assigned {res.left_concept_value}" \
-        if res.consistent_knowledge_base else f"TRUE: the knowledge base is inconsistent!"
-    console.print(title)
-    if show_solution == ShowSolutionOption.ALWAYS or (show_solution == ShowSolutionOption.IF_WITNESS and res.witness):
-        console.print(network_values_to_table(res.assignment))
+        res = sweep(app_options.controller, val_phis, query, max_workers=workers)
+
+    table = Table(title="ValPhi sweep")
+    table.add_column("ValPhi")
+    table.add_column("Truth degrees")
+    if query is None:
+        table.add_column("Solutions")
+    else:
+        table.add_column("Answer")
+        table.add_column("Typical degree")
+    table.add_column("Time (s)")
+    for result in res:
+        if query is None:
+            outcome = [str(result.number_of_solutions)]
+        elif result.consistent_knowledge_base:
+            outcome = [str(result.true).upper(), str(result.left_concept_value)]
+        else:
+            outcome = ["TRUE (inconsistent)", "-"]
+        table.add_row(result.label, str(result.max_value + 1), *outcome, f"{result.seconds:.3f}")
+    console.print(table)
 
+
+@app.command(name="plan")
+def command_plan() -> None:
+    """
+    Print the treatment of each node in the hybrid mode, and the estimated costs it is based on.
+    """
+    from rich.table import Table
+
+    res = app_options.controller.encoding_plan()
+
+    table = Table(title="Encoding plan")
+    table.add_column("Node")
+    table.add_column("Fan-in")
+    table.add_column("Weight constraint size")
+    table.add_column("Propagator cost")
+    table.add_column("Encoding")
+    for node in res:
+        table.add_row(node.node, str(node.fan_in), str(node.weight_constraint_size), str(node.propagator_cost),
+                      "weight constraints" if node.use_weight_constraints else "propagator")
+    console.print(table)
+    console.print(f"{sum(node.use_weight_constraints for node in res)} nodes with weight constraints, "
+                  f"{sum(not node.use_weight_constraints for node in res)} with propagators")
+
+
+@app.command(name="convert")
+def command_convert(
+        output_filename: Path = typer.Argument(
+            ...,
+            help="File where to store the converted network",
+        ),
+        output_format: NetworkFormat = typer.Option(
+            NetworkFormat.BINARY,
+            "--to",
+            case_sensitive=False,
+            help="Format of the converted network (the input format is detected automatically)",
+        ),
+) -> None:
+    """
+    Convert the network topology between the text and the binary (memory-mapped) formats.
+    """
+    network = app_options.controller.network
+    if output_format == NetworkFormat.BINARY:
+        network.save_binary(output_filename)
+    else:
+        with open(output_filename, "w") as f:
+            f.write(network.serialize())
+    console.print(f"Network stored in {output_filename}")
@@ -0,0 +1,70 @@
+import json
+from pathlib import Path
+from typing import Dict, Any, Final, Tuple
+
+import numpy as np
+from dumbo_utils.validation import validate
+
+MAGIC: Final = b"VALPHI\x00\x01"
+ALIGNMENT: Final = 64
+
+# Layout of a container:
+#   MAGIC (8 bytes), header length (little-endian uint64), header (JSON, utf-8), padding,
+#   arrays (little-endian, each one aligned to ALIGNMENT bytes from the beginning of the file).
+# The header stores the kind of network, its metadata and, for each array, its dtype, shape and offset.
+
+
+def is_container(path: Path) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_container(path: Path, kind: str, metadata: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> None:
+    arrays = {name: np.ascontiguousarray(array, dtype=np.dtype(array.dtype).newbyteorder('<'))
+              for name, array in arrays.items()}
+    descriptors = {name: {"dtype": array.dtype.str, "shape": list(array.shape), "offset": 0}
+                   for name, array in arrays.items()}
+
+    def encode_header() -> bytes:
+        return json.dumps({"kind": kind, "metadata": metadata, "arrays": descriptors}).encode()
+
+    # offsets depend on the header length, which depends on the offsets: iterate until stable
+    header = encode_header()
+    while True:
+        offset = _align(len(MAGIC) + 8 + len(header))
+        for name, array in arrays.items():
+            descriptors[name]["offset"] = offset
+            offset = _align(offset + array.nbytes)
+        new_header = encode_header()
+        if len(new_header) == len(header):
+            header = new_header
+            break
+        header = new_header
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for name, array in arrays.items():
+            f.write(b"\x00" * (descriptors[name]["offset"] - f.tell()))
+            f.write(array.tobytes())
+
+
+def read_container(path: Path) -> Tuple[str, Dict[str, Any], Dict[str, np.ndarray]]:
+    with open(path, "rb") as f:
+        validate("magic", f.read(len(MAGIC)), equals=MAGIC, help_msg=f"File {path} is not a binary network")
+        header_length = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(header_length).decode())
+    arrays = {}
+    for name, descriptor in header["arrays"].items():
+        shape = tuple(descriptor["shape"])
+        if 0 in shape:
+            arrays[name] = np.empty(shape, dtype=descriptor["dtype"])
+        else:
+            arrays[name] = np.memmap(path, dtype=descriptor["dtype"], mode="r", offset=descriptor["offset"],
+                                     shape=shape)
+    return header["kind"], header["metadata"], arrays
@@ -1,18 +1,22 @@
 import dataclasses
+import re
 from dataclasses import InitVar
-from enum import Enum, auto
-from typing import List, Optional, Final
+from typing import List, Optional, Final, Set, Tuple, Dict, Iterable, Union
 
 import clingo
 import typeguard
 from clingo.symbol import Number
 from dumbo_utils.primitives import PrivateKey
 from dumbo_utils.validation import validate, pattern
-from pydot import frozendict
 
 from valphi.contexts import Context
+from valphi.domains import domain_facts
 from valphi.models import ModelCollect, LastModel
 from valphi.networks import NetworkTopology, MaxSAT, NetworkInterface, ArgumentationGraph
+from valphi.options import ParallelMode, DEFAULT_VAL_PHI, QueryEngine
+from valphi.plans import NodePlan, plan_nodes
+from valphi.propagators import ValPhiPropagator
+from valphi.utils import frozendict
 
 
 @typeguard.typechecked
@@ -23,6 +27,13 @@ class Controller:
     raw_code: str = dataclasses.field(default="")
     use_wc: Optional[int] = dataclasses.field(default=None)
     use_ordered_encoding: bool = dataclasses.field(default=False)
+    use_domain_pruning: bool = dataclasses.field(default=False)
+    use_cone_of_influence: bool = dataclasses.field(default=False)
+    threads: int = dataclasses.field(default=1)
+    parallel_mode: ParallelMode = dataclasses.field(default=ParallelMode.COMPETE)
+    use_hybrid: bool = dataclasses.field(default=False)
+    clingo_arguments: List[str] = dataclasses.field(default_factory=list)
+    query_engine: QueryEngine = dataclasses.field(default=QueryEngine.OPTIMIZATION)
 
     @typeguard.typechecked
     @dataclasses.dataclass(frozen=True)
@@ -74,11 +85,24 @@ class Controller:
                 left_concept_value=None,
             )
 
+    @typeguard.typechecked
+    @dataclasses.dataclass(frozen=True)
+    class SolutionCount:
+        """
+        The number of solutions, which is a lower bound if the count is not complete.
+        """
+        count: int
+        complete: bool
+
     def __post_init__(self):
         validate("max_value", self.max_value, min_value=1, max_value=1000)
         validate("val_phi", self.val_phi, equals=sorted(self.val_phi))
+        validate("threads", self.threads, min_value=1, max_value=64)
         if self.use_wc is not None:
             validate("use_wc", self.use_wc, min_value=1, max_value=1_000_000)
+        if self.use_hybrid:
+            validate("use_hybrid", self.use_wc is not None, equals=True,
+                     help_msg="The hybrid mode requires the multiplier of weight constraints")
         # if self.use_wc:
         #     validate("val-phi must be integer", all(type(value) is int or value.is_integer() for value in self.val_phi),
         #              equals=True, help_msg="Weight-constraints requires an integer val-phi")
@@ -87,86 +111,335 @@ class Controller:
 
     @staticmethod
     def default_val_phi() -> List[float]:
-        return [-10.987, -4.237, 0, 4.236, 10.986]
+        return list(DEFAULT_VAL_PHI)
 
     @property
     def max_value(self) -> int:
         return len(self.val_phi)
 
-    def __setup_control(self, query: Optional[str] = None):
-        network = self.network if self.use_wc is None else self.network.approximate(self.use_wc)
-        # control = clingo.Control(["--opt-strategy=usc,k,4", "--opt-usc-shrink=rgs"] if query else [])
-        control = clingo.Control()
+    def __setup_control(self, query: Optional[str] = None, session: bool = False,
+                        thresholds: Optional[List[Tuple[str, str]]] = None) \
+            -> Tuple[clingo.Control, List[ValPhiPropagator]]:
+        network = self.network
+        if query is not None and self.use_cone_of_influence:
+            network = network.cone_of_influence(self.__mentioned_concepts(query))
+        if self.use_wc is not None:
+            network = network.approximate(self.use_wc)
+        control = clingo.Control((["--heuristic=Domain"] if session else []) + self.__parallel_arguments()
+                                 + self.clingo_arguments)
         # control.configuration.solve.models = self.max_stable_models if query is None else 0
+        query_program = ""
+        if query is not None and thresholds is None:
+            query_program = (QUERY_ORDERED_ENCODING if self.use_ordered_encoding else QUERY_ENCODING) \
+                + f"query({query})."
+        elif query is not None:
+            if self.query_engine != QueryEngine.OPTIMIZATION:
+                query_program = SEARCH_ENCODING
+            elif self.use_ordered_encoding:
+                query_program = THRESHOLDS_ORDERED_ENCODING
+            else:
+                query_program = THRESHOLDS_ENCODING
+            query_program += f"query_thresholds({query})." \
+                + ''.join(f'query_threshold({index},"{comparator}","{threshold}").'
+                          for index, (comparator, threshold) in enumerate(thresholds))
         control.add("base", ["max_value"], BASE_PROGRAM
-                    + (QUERY_ENCODING if query and not self.use_ordered_encoding else "")
-                    + (QUERY_ORDERED_ENCODING if query and self.use_ordered_encoding else "")
                     + (ORDERED_ENCODING if self.use_ordered_encoding else "")
                     + network.network_facts.as_facts
-                    + self.raw_code + ("" if query is None else f"query({query})."))
+                    + ('\n' + '\n'.join(self.__domain_facts(network)) + '\n' if self.use_domain_pruning else "")
+                    + self.raw_code + query_program)
         control.ground([("base", [Number(self.max_value)])], context=Context())
-        if self.use_wc:
-            constraints = self.__generate_wc()
+        propagators = []
+        if self.use_hybrid:
+            plan = self.__plan(network)
+            constraints = self.__generate_wc(wc_nodes={node.node for node in plan if node.use_weight_constraints})
+            control.add("base", ["max_value"], '\n'.join(constraints))
+            control.ground([("base", [Number(self.max_value)])], context=Context())
+            propagators = network.register_propagators(
+                control, [round(value * self.use_wc) for value in self.val_phi],
+                nodes={node.node for node in plan if not node.use_weight_constraints},
+            )
+        elif self.use_wc:
+            constraints = self.__generate_wc(session)
             control.add("base", ["max_value"], '\n'.join(constraints))
             control.ground([("base", [Number(self.max_value)])], context=Context())
+            for atom in control.symbolic_atoms.by_signature("session_active", 2):
+                control.assign_external(atom.symbol, True)
         else:
-            network.register_propagators(control, self.val_phi)
-        return control
-
-    def __read_eval(self, model) -> frozendict:
+            propagators = network.register_propagators(control, self.val_phi)
+            for propagator in propagators:
+                propagator.tag_clauses = session
+        return control, propagators
+
+    def __parallel_arguments(self) -> List[str]:
+        if self.threads == 1:
+            return []
+        return [f"--parallel-mode={self.threads},{self.parallel_mode.value}"]
+
+    def encoding_plan(self) -> List[NodePlan]:
+        """
+        The treatment of each node in the hybrid mode, either by weight constraints or by a propagator.
+        """
+        validate("use_wc", self.use_wc is not None, equals=True,
+                 help_msg="The plan requires the multiplier of weight constraints")
+        return self.__plan(self.network.approximate(self.use_wc))
+
+    def __plan(self, network: NetworkInterface) -> List[NodePlan]:
+        return plan_nodes(network, self.max_value, ordered=self.use_ordered_encoding)
+
+    def __mentioned_concepts(self, query: str) -> Set[str]:
+        # any identifier in the query or in the raw code (a superset of the concepts they depend on)
+        return set(re.findall(r"[a-z][A-Za-z0-9_']*", query + '\n' + self.raw_code))
+
+    def __domain_facts(self, network: NetworkInterface) -> List[str]:
+        val_phi = self.val_phi if self.use_wc is None else [round(value * self.use_wc) for value in self.val_phi]
+        return domain_facts(network, val_phi, self.raw_code)
+
+    def read_eval(self, model) -> frozendict:
+        return self.__read_eval_arguments(symbol.arguments for symbol in model if symbol.predicate_name == "eval")
+
+    def __read_eval_arguments(self, arguments: Iterable[List[clingo.Symbol]]) -> frozendict:
         res = {}
-        for symbol in model:
-            if symbol.predicate_name == "eval":
-                concept, individual, value = symbol.arguments
-                if concept.name in ["top", "bot"]:
-                    continue
-                if type(self.network) is NetworkTopology:
-                    layer, node = concept.name[1:].split('_', maxsplit=1)
-                    res[(int(layer), int(node))] = f"{value.number}/{self.max_value}"
-                elif type(self.network) is ArgumentationGraph:
-                    validate("format", concept.name, custom=[pattern(r"a[0-9]+")],
-                             help_msg="The format of the argument is wrong")
-                    validate("format", concept.arguments, length=0, help_msg="The format of the argument is wrong")
-                    res[concept.name] = f"{value.number}/{self.max_value}"
-                else:
-                    res[f"{concept}({individual})"] = f"{value.number}/{self.max_value}"
+        for concept, individual, value in arguments:
+            if concept.name in ["top", "bot"]:
+                continue
+            key = self.__eval_key(concept, individual)
+            res[key] = f"{value.number}/{self.max_value}"
         return frozendict(res)
 
+    def __eval_key(self, concept: clingo.Symbol, individual: clingo.Symbol) -> Union[Tuple[int, int], str]:
+        if type(self.network) is NetworkTopology:
+            layer, node = concept.name[1:].split('_', maxsplit=1)
+            return int(layer), int(node)
+        if type(self.network) is ArgumentationGraph:
+            validate("format", concept.name, custom=[pattern(r"a[0-9]+")],
+                     help_msg="The format of the argument is wrong")
+            validate("format", concept.arguments, length=0, help_msg="The format of the argument is wrong")
+            return concept.name
+        return f"{concept}({individual})"
+
     @staticmethod
     def __read_typical(model) -> int:
         for symbol in model:
             if symbol.predicate_name == "typical":
                 return symbol.arguments[0].number
 
-    def find_solutions(self, max_number_of_solutions: int = 0) -> List[frozendict]:
+    def find_solutions(self, max_number_of_solutions: int = 0, projection: Optional[List[str]] = None,
+                       cube: Optional[List[Tuple[str, int]]] = None) -> List[frozendict]:
+        """
+        Enumerate the solutions, or their distinct restrictions to the nodes in projection (only those are decoded;
+        see expand_solution). If a cube is given, only solutions assigning each of its nodes the associated truth degree
+        (for the anonymous individual) are enumerated.
+        """
         validate('max_number_of_solutions', max_number_of_solutions, min_value=0)
         if type(self.network) is MaxSAT:
             raise ValueError("Use 'query even' for MaxSAT")
-        control = self.__setup_control()
+        control, _ = self.__setup_control()
         control.configuration.solve.models = max_number_of_solutions
+        assumptions = self.__cube_assumptions(cube)
+        if projection is None:
+            model_collect = ModelCollect()
+            control.solve(assumptions=assumptions, on_model=model_collect)
+            return [self.read_eval(model) for model in model_collect]
+
+        atoms = self.__project(control, projection)
+        res = []
+
+        def on_model(model):
+            res.append(self.__read_eval_arguments(atom.symbol.arguments for atom in atoms
+                                                  if atom.is_fact or model.is_true(atom.literal)))
+        control.solve(assumptions=assumptions, on_model=on_model)
+        return res
+
+    def expand_solution(self, solution: frozendict, projection: List[str]) -> frozendict:
+        """
+        A solution extending the given one, which is a solution projected onto the nodes in projection.
+        """
+        validate("network", type(self.network) is MaxSAT, equals=False, help_msg="Use 'query even' for MaxSAT")
+        control, _ = self.__setup_control()
+        control.configuration.solve.models = 1
+        assumptions = []
+        for atom in self.__projected_atoms(control, projection):
+            concept, individual, value = atom.symbol.arguments
+            key = self.__eval_key(concept, individual)
+            validate("solution", key in solution, equals=True, help_msg=f"No value for {concept} in the solution")
+            assumptions.append((atom.symbol, solution[key] == f"{value.number}/{self.max_value}"))
         model_collect = ModelCollect()
-        control.solve(on_model=model_collect)
-        return [self.__read_eval(model) for model in model_collect]
+        control.solve(assumptions=assumptions, on_model=model_collect)
+        validate("solution", len(model_collect), equals=1, help_msg="The solution cannot be extended")
+        return self.read_eval(model_collect[0])
+
+    def count_solutions(self, projection: Optional[List[str]] = None, timeout: Optional[float] = None,
+                        cube: Optional[List[Tuple[str, int]]] = None) -> "Controller.SolutionCount":
+        """
+        Count the solutions (or their distinct restrictions to the nodes in projection, and within the cube, if any)
+        without decoding them. If timeout (in seconds) expires, the search is interrupted and the count is a lower bound.
+        """
+        if timeout is not None:
+            validate("timeout", timeout, min_value=0)
+        control, _ = self.__setup_control()
+        control.configuration.solve.models = 0
+        if projection is not None:
+            self.__project(control, projection)
+        count = 0
+
+        def on_model(_):
+            nonlocal count
+            count += 1
+
+        with control.solve(assumptions=self.__cube_assumptions(cube), on_model=on_model, async_=True) as handle:
+            complete = handle.wait(timeout)
+            if not complete:
+                handle.cancel()
+        return Controller.SolutionCount(count=count, complete=complete)
 
-    def answer_query(self, query: str) -> "Controller.QueryResult":
+    @staticmethod
+    def __cube_assumptions(cube: Optional[List[Tuple[str, int]]]) -> List[Tuple[clingo.Symbol, bool]]:
+        if cube is None:
+            return []
+        anonymous = clingo.Function("anonymous")
+        return [(clingo.Function("eval", [clingo.parse_term(node), anonymous, Number(value)]), True)
+                for node, value in cube]
+
+    def __project(self, control: clingo.Control, projection: List[str]) -> List[clingo.SymbolicAtom]:
+        atoms = self.__projected_atoms(control, projection)
+        with control.backend() as backend:
+            backend.add_project([atom.literal for atom in atoms if not atom.is_fact])
+        control.configuration.solve.project = "project"
+        return atoms
+
+    @staticmethod
+    def __projected_atoms(control: clingo.Control, projection: List[str]) -> List[clingo.SymbolicAtom]:
+        concepts = set(projection)
+        res = [atom for atom in control.symbolic_atoms.by_signature("eval", 3)
+               if str(atom.symbol.arguments[0]) in concepts]
+        unknown = concepts - set(str(atom.symbol.arguments[0]) for atom in res)
+        validate("projection", unknown, length=0, help_msg=f"Unknown nodes: {', '.join(sorted(unknown))}")
+        return res
+
+    def parse_query(self, query: str) -> Tuple[str, str, str, str]:
         if type(self.network) is MaxSAT:
             validate("query", query, equals="even")
             query = self.network.query
         validate("query", query, custom=[pattern(r"[^#]+#[^#]+#(<|<=|>=|>)#(1|1.0|0\.\d+)")],
                  help_msg=f'The query "{query}" is not in the expected format. Is it a filename?')
         left, right, comparator, threshold = query.split('#')
-        control = self.__setup_control(f'{left},{right},"{comparator}","{threshold}"')
+        return left, right, comparator, threshold
+
+    def answer_query(self, query: str) -> "Controller.QueryResult":
+        left, right, comparator, threshold = self.parse_query(query)
+        if self.query_engine != QueryEngine.OPTIMIZATION:
+            return self.__answer_query_thresholds(left, right, [(comparator, threshold)])[0]
+        control, _ = self.__setup_control(f'{left},{right},"{comparator}","{threshold}"')
 
         last_model = LastModel()
         control.solve(on_model=last_model)
+        return self.query_result(last_model, comparator)
 
+    def query_result(self, last_model: LastModel, comparator: str) -> "Controller.QueryResult":
         if not last_model.has():
             return self.QueryResult.of_inconsistent_knowledge_base()
 
         model = last_model.get()
-        eval_values = self.__read_eval(model)
-        left_concept_value = self.__read_typical(model)
         witness = len(model.filter(lambda atom: atom.predicate_name == "witness")) > 0
+        return self.__query_result_of(model, comparator, witness)
+
+    def parse_query_thresholds(self, query: str) -> Tuple[str, str, List[Tuple[str, str]]]:
+        validate("network", type(self.network) is MaxSAT, equals=False,
+                 help_msg="MaxSAT networks only support 'query even'")
+        validate("query", query, custom=[pattern(r"[^#]+#[^#]+(#(<|<=|>=|>)#(1|1.0|0\.\d+))+")],
+                 help_msg=f'The query "{query}" is not in the expected format. Is it a filename?')
+        left, right, *thresholds = query.split('#')
+        return left, right, list(zip(thresholds[::2], thresholds[1::2]))
+
+    def answer_query_thresholds(self, query: str) -> List["Controller.QueryResult"]:
+        """
+        Answer a query of the form left#right#comparator#threshold#...#comparator#threshold, one result per threshold.
+
+        The typical degree of the left concept is optimized once (or searched, according to query_engine); each
+        threshold is then decided by a (non-optimizing) solve whose assumptions fix the optimum just found.
+        """
+        left, right, thresholds = self.parse_query_thresholds(query)
+        return self.__answer_query_thresholds(left, right, thresholds)
+
+    def __answer_query_thresholds(self, left: str, right: str,
+                                  thresholds: List[Tuple[str, str]]) -> List["Controller.QueryResult"]:
+        control, _ = self.__setup_control(f"{left},{right}", thresholds=thresholds)
+        if self.query_engine != QueryEngine.OPTIMIZATION:
+            return self.__search_query_thresholds(control, thresholds)
+
+        last_model = LastModel()
+        control.solve(on_model=last_model)
+        if not last_model.has():
+            return [self.QueryResult.of_inconsistent_knowledge_base() for _ in thresholds]
+
+        optimum = last_model.get()
+        if self.use_ordered_encoding:
+            assumptions = [(clingo.Function(atom.predicate_name, [Number(atom.arguments[0].number)]), True)
+                           for atom in optimum if atom.predicate_name == "typical_degree"]
+        else:
+            present = {atom.arguments[0].number for atom in optimum if atom.predicate_name == "degree_present"}
+            assumptions = [(clingo.Function("degree_present", [Number(value)]), value in present)
+                           for value in range(1, self.max_value + 1)]
+
+        control.configuration.solve.opt_mode = "ignore"
+        control.configuration.solve.models = 1
+        res = []
+        for index, (comparator, _) in enumerate(thresholds):
+            witness_model = LastModel()
+            control.solve(assumptions=assumptions + [(clingo.Function("threshold_witness", [Number(index)]), True)],
+                          on_model=witness_model)
+            witness = witness_model.has()
+            res.append(self.__query_result_of(witness_model.get() if witness else optimum, comparator, witness))
+        return res
+
+    def __search_query_thresholds(self, control: clingo.Control,
+                                  thresholds: List[Tuple[str, str]]) -> List["Controller.QueryResult"]:
+        """
+        The typical degree is the largest V such that degree_at_least(V) can be assumed, which is searched by solving
+        under assumptions (each model improving the lower bound); witnesses are then searched among models with that
+        typical degree.
+        """
+        control.configuration.solve.models = 1
+
+        def solve(assumptions):
+            model = LastModel()
+            control.solve(assumptions=assumptions, on_model=model)
+            return model
+
+        def at_least(value: int, truth: bool = True) -> Tuple[clingo.Symbol, bool]:
+            return clingo.Function("degree_at_least", [Number(value)]), truth
+
+        last_model = solve([])
+        if not last_model.has():
+            return [self.QueryResult.of_inconsistent_knowledge_base() for _ in thresholds]
+        optimum = last_model.get()
+        lower, upper = self.__read_typical(optimum), self.max_value
+        while lower < upper:
+            value = upper if self.query_engine == QueryEngine.DESCENDING else (lower + upper + 1) // 2
+            last_model = solve([at_least(value)])
+            if last_model.has():
+                optimum = last_model.get()
+                lower = self.__read_typical(optimum)
+            else:
+                upper = value - 1
+
+        assumptions = [at_least(lower)] if lower > 0 else []
+        if lower < self.max_value:
+            assumptions.append(at_least(lower + 1, False))
+        res = []
+        for index, (comparator, _) in enumerate(thresholds):
+            if any(atom.predicate_name == "threshold_witness" and atom.arguments[0].number == index
+                   for atom in optimum):
+                res.append(self.__query_result_of(optimum, comparator, True))
+                continue
+            witness_model = solve(assumptions + [(clingo.Function("threshold_witness", [Number(index)]), True)])
+            witness = witness_model.has()
+            res.append(self.__query_result_of(witness_model.get() if witness else optimum, comparator, witness))
+        return res
+
+    def __query_result_of(self, model, comparator: str, witness: bool) -> "Controller.QueryResult":
+        eval_values = self.read_eval(model)
+        left_concept_value = self.__read_typical(model)
         factory_method = self.QueryResult.of_false if witness == (comparator in [">", ">="]) \
             else self.QueryResult.of_true
         return factory_method(
@@ -175,19 +448,155 @@ class Controller:
             witness=witness,
         )
 
-    def __generate_wc(self):
+    def open_session(self, query: Optional[str] = None) -> "Session":
+        """
+        Ground the program once, for solutions or for the given query, and keep it alive for incremental updates.
+        """
+        validate("use_hybrid", self.use_hybrid, equals=False, help_msg="Sessions do not support the hybrid mode")
+        if query is None:
+            validate("network", type(self.network) is MaxSAT, equals=False, help_msg="Use 'query even' for MaxSAT")
+            control, propagators = self.__setup_control(session=True)
+            return Session(controller=self, control=control, propagators=propagators)
+        left, right, comparator, threshold = self.parse_query(query)
+        control, propagators = self.__setup_control(f'{left},{right},"{comparator}","{threshold}"', session=True)
+        return Session(controller=self, control=control, propagators=propagators, comparator=comparator)
+
+    def __generate_wc(self, session: bool = False, wc_nodes: Optional[Set[str]] = None):
         val_phi = [round(value * self.use_wc) for value in self.val_phi]
         res = [f"val_phi(0,#inf,{int(val_phi[0])})."]
         for value in range(len(val_phi) - 1):
             res.append(f"val_phi({value + 1},{int(val_phi[value])},{int(val_phi[value + 1])}).")
         res.append(f"val_phi({len(val_phi)},{int(val_phi[-1])},#sup).")
-        if self.use_ordered_encoding:
+        if wc_nodes is None:
+            res.append("wc_node(C) :- weighted_typicality_inclusion(C,_,_).")
+        else:
+            res.extend(f"wc_node({node})." for node in sorted(wc_nodes))
+            res.append("wc_node(0) :- #false.")
+        if session:
+            res.append(SESSION_WC_WEIGHTS)
+            res.append(session_wc_encoding(self.use_ordered_encoding, version=0))
+        elif self.use_ordered_encoding:
             res.append(WC_ORDERED_ENCODING)
         else:
             res.append(WC_ENCODING)
         return res
 
 
+@typeguard.typechecked
+@dataclasses.dataclass(frozen=True)
+class Session:
+    """
+    A grounded program whose weights can be changed between solving steps.
+
+    Propagators update their weights in place (and tag their clauses, which are valid for one step only), while
+    weight constraints of a node are guarded by an external atom and replaced by a new version of the node.
+    Each step is seeded with the assignment of the last model of the previous step as phase hints.
+    """
+    controller: Controller
+    control: clingo.Control
+    propagators: List[ValPhiPropagator]
+    comparator: Optional[str] = dataclasses.field(default=None)
+    __weights: Dict[clingo.Symbol, Dict[clingo.Symbol, int]] = dataclasses.field(default_factory=dict, init=False)
+    __versions: Dict[clingo.Symbol, int] = dataclasses.field(default_factory=dict, init=False)
+    __hints: List[clingo.Symbol] = dataclasses.field(default_factory=list, init=False)
+    __hints_condition: List[int] = dataclasses.field(default_factory=list, init=False)
+
+    def __post_init__(self):
+        for atom in self.control.symbolic_atoms.by_signature("session_weight", 4):
+            node, input_node, weight, _ = atom.symbol.arguments
+            self.__weights.setdefault(node, {})[input_node] = weight.number
+
+    def update_weight(self, node: str, input_node: str, weight: float) -> None:
+        node_term, input_term = clingo.parse_term(node), clingo.parse_term(input_node)
+        if self.controller.use_wc is None:
+            propagators = [propagator for propagator in self.propagators if propagator.output_node == str(node_term)]
+            validate("node", propagators, min_len=1, help_msg=f"{node} has no inputs")
+            for propagator in propagators:
+                propagator.update_weight(input_term, weight)
+            return
+
+        weights = self.__weights.get(node_term)
+        validate("node", weights is not None, equals=True, help_msg=f"{node} has no inputs")
+        validate("input node", input_term in weights, equals=True, help_msg=f"{input_node} is not an input of {node}")
+        weights[input_term] = round(weight * self.controller.use_wc)
+        self.control.release_external(
+            clingo.Function("session_active", [node_term, Number(self.__versions.get(node_term, 0))])
+        )
+        version = max(self.__versions.values(), default=0) + 1
+        self.__versions[node_term] = version
+        part = f"session_{version}"
+        self.control.add(part, [], '\n'.join(
+            [f"session_weight({node_term},{other},{value},{version})." for other, value in weights.items()]
+            + [f"#external session_active({node_term},{version}).",
+               session_wc_encoding(self.controller.use_ordered_encoding, version=version)]
+        ))
+        self.control.ground([(part, [])], context=Context())
+        self.control.assign_external(clingo.Function("session_active", [node_term, Number(version)]), True)
+
+    def update_bias(self, node: str, bias: float) -> None:
+        self.update_weight(node, "top", bias)
+
+    def update_val_phi(self, val_phi: List[float]) -> None:
+        """
+        Replace the ValPhi function with another one with the same number of truth degrees (propagators only, as the
+        thresholds of weight constraints and statically computed domains are part of the grounded program).
+        """
+        validate("session", self.controller.use_wc is None, equals=True,
+                 help_msg="ValPhi cannot be changed when weight constraints are used")
+        validate("session", self.controller.use_domain_pruning, equals=False,
+                 help_msg="ValPhi cannot be changed when domains are pruned")
+        validate("val_phi", val_phi, equals=sorted(val_phi))
+        for propagator in self.propagators:
+            propagator.update_val_phi(val_phi)
+
+    def find_solutions(self, max_number_of_solutions: int = 0) -> List[frozendict]:
+        validate('max_number_of_solutions', max_number_of_solutions, min_value=0)
+        validate("session", self.comparator is None, equals=True, help_msg="The session was opened for a query")
+        self.control.configuration.solve.models = max_number_of_solutions
+        model_collect = ModelCollect()
+        self.__solve(model_collect)
+        return [self.controller.read_eval(model) for model in model_collect]
+
+    def answer_query(self) -> "Controller.QueryResult":
+        validate("session", self.comparator is not None, equals=True, help_msg="The session was not opened for a query")
+        last_model = LastModel()
+        self.__solve(last_model)
+        return self.controller.query_result(last_model, self.comparator)
+
+    def __solve(self, on_model) -> None:
+        self.__add_hints()
+        hints = []
+
+        def callback(model):
+            hints.clear()
+            hints.extend(symbol for symbol in model.symbols(shown=True) if symbol.name == "eval")
+            on_model(model)
+
+        self.control.solve(on_model=callback)
+        if hints:
+            self.__hints.clear()
+            self.__hints.extend(hints)
+
+    def __add_hints(self) -> None:
+        for condition in self.__hints_condition:
+            self.control.release_external(condition)
+        self.__hints_condition.clear()
+        if not self.__hints:
+            return
+        with self.control.backend() as backend:
+            condition = backend.add_atom()
+            backend.add_external(condition, clingo.TruthValue.True_)
+            for symbol in self.__hints:
+                atom = self.control.symbolic_atoms[symbol]
+                if atom is not None:
+                    backend.add_heuristic(atom.literal, clingo.backend.HeuristicType.Sign, 1, 0, [condition])
+        self.__hints_condition.append(condition)
+
+
+def session_wc_encoding(ordered: bool, version: int) -> str:
+    return (SESSION_WC_ORDERED_ENCODING if ordered else SESSION_WC_ENCODING).replace("VERSION", str(version))
+
+
 BASE_PROGRAM: Final = """
 % let's use max_value+1 truth degrees of the form 0/max_value ... max_value/max_value
 truth_degree(0..max_value).
@@ -206,6 +615,7 @@ individual(X) :- assertion(_,X,_,_).
 
 % concepts from the query
 concept(impl(C,D)) :- query(C,D,_,_).
+concept(impl(C,D)) :- query_thresholds(C,D).
 
 % sub-concepts
 concept(A) :- concept(and(A,B)).
@@ -224,9 +634,17 @@ eval(top,X,max_value) :- individual(X).
 concept(bot).
 eval(bot,X,0) :- individual(X).
 
+% truth degrees excluded by statically computed domains (if any)
+outside_domain(C,X,V) :- domain(C,L,U), individual(X), truth_degree(V), V < L.
+outside_domain(C,X,V) :- domain(C,L,U), individual(X), truth_degree(V), V > U.
+outside_domain(C,X,V) :- individual_domain(C,X,L,U), truth_degree(V), V < L.
+outside_domain(C,X,V) :- individual_domain(C,X,L,U), truth_degree(V), V > U.
+
 % guess evaluation (optimize for crisp concepts)
-{eval(C,X,V) : truth_degree(V)} = 1 :- concept(C), individual(X), @is_named_concept(C) = 1, not crisp(C).
-{eval(C,X,0); eval(C,X,max_value)} = 1 :- concept(C), individual(X), @is_named_concept(C) = 1, crisp(C).
+{eval(C,X,V) : truth_degree(V), not outside_domain(C,X,V)} = 1 :- 
+    concept(C), individual(X), @is_named_concept(C) = 1, not crisp(C).
+{eval(C,X,0) : not outside_domain(C,X,0); eval(C,X,max_value) : not outside_domain(C,X,max_value)} = 1 :- 
+    concept(C), individual(X), @is_named_concept(C) = 1, crisp(C).
 :- concept(C), @is_named_concept(C) != 1, crisp(C); individual(X), not eval(C,X,0), not eval(C,X,max_value).
 
 % Godel evaluation of complex concepts
@@ -291,21 +709,41 @@ eval(impl(A,B),X, @implication(V1,V2, max_value))
     :~ witness. [-1@1] 
 % query witness : end
 
+% query witnesses for several thresholds : begin
+    typical_element(C,X) :- query_thresholds(C,_), eval(C,X,V), V = #max{V' : eval(C,X',V')}.
+    typical_degree(V) :- query_thresholds(C,_), typical_element(C,X), eval(C,X,V).
+
+    threshold_witness(I) :- query_thresholds(C,D), query_threshold(I,Operator,Alpha), Operator = ">=";
+       typical_element(C,X), eval(impl(C,D),X,V), @ge(V,max_value, Alpha) != 1.
+    threshold_witness(I) :- query_thresholds(C,D), query_threshold(I,Operator,Alpha), Operator = ">";
+       typical_element(C,X), eval(impl(C,D),X,V), @gt(V,max_value, Alpha) != 1.
+    threshold_witness(I) :- query_thresholds(C,D), query_threshold(I,Operator,Alpha), Operator = "<=";
+       typical_element(C,X), eval(impl(C,D),X,V), @le(V,max_value, Alpha) = 1.
+    threshold_witness(I) :- query_thresholds(C,D), query_threshold(I,Operator,Alpha), Operator = "<";
+       typical_element(C,X), eval(impl(C,D),X,V), @lt(V,max_value, Alpha) = 1.
+% query witnesses for several thresholds : end
+
 
 #show.
 #show eval(C,X,V) : eval(C,X,V), concept(C), @is_named_concept(C) = 1.
 #show typical(V) : typical_element(C,X), eval(C,X,V).
 #show witness/0.
+#show typical_degree/1.
+#show threshold_witness/1.
 
 
 
 % prevent these warnings
 individual(0) :- #false.
 crisp(0) :- #false.
+domain(0,0,0) :- #false.
+individual_domain(0,0,0,0) :- #false.
 attack(0,0,0) :- #false.
 exactly_one(0) :- #false.
 exactly_one_element(0,0) :- #false.
 query(0,0,0,0) :- #false.
+query_thresholds(0,0) :- #false.
+query_threshold(0,0,0) :- #false.
 concept_inclusion(0,0,0,0) :- #false.
 assertion(0,0,0,0) :- #false.
 weighted_typicality_inclusion(0,0,0) :- #false.
@@ -321,6 +759,24 @@ QUERY_ORDERED_ENCODING: Final = """
 :~ query(C,_,_,_), eval_ge(C,X,V). [-1@2, V]
 """
 
+THRESHOLDS_ENCODING: Final = """
+% find the largest truth degree for the left-hand-side concept of query (the same for all thresholds)
+degree_present(V) :- query_thresholds(C,_), eval(C,X,V), V > 0.
+:~ degree_present(V). [-1@V+1]
+#show degree_present/1.
+"""
+
+SEARCH_ENCODING: Final = """
+% truth degrees reached by the left-hand-side concept of query (the largest one is searched by assumptions)
+degree_at_least(V) :- query_thresholds(C,_), eval(C,X,V), V > 0.
+degree_at_least(V) :- degree_at_least(V+1), V > 0.
+"""
+
+THRESHOLDS_ORDERED_ENCODING: Final = """
+% find the largest truth degree for the left-hand-side concept of query (the same for all thresholds)
+:~ query_thresholds(C,_), eval_ge(C,X,V). [-1@2, V]
+"""
+
 ORDERED_ENCODING: Final = """
 {eval_ge(C,X,V) : truth_degree(V), V > 0} :- concept(C), individual(X).
 :- eval_ge(C,X,V), V > 1, not eval_ge(C,X,V-1).
@@ -358,13 +814,13 @@ premise_greater_than_conclusion(A,B,X) :-
 
 WC_ENCODING: Final = """
 :- truth_degree(V), val_phi(V,LB,UB);
-   weighted_typicality_inclusion(C,_,_), individual(X);
+   wc_node(C), individual(X);
    LB < #sum{
        @str_to_int(W) * VD,D,VD : weighted_typicality_inclusion(C,D,W), eval(D,X,VD), VD > 0
    } <= UB;
    not eval(C,X,V).
 :- truth_degree(V), val_phi(V,LB,UB);
-   weighted_typicality_inclusion(C,_,_), individual(X);
+   wc_node(C), individual(X);
    not LB < #sum{
        @str_to_int(W) * VD,D,VD : weighted_typicality_inclusion(C,D,W), eval(D,X,VD), VD > 0
    } <= UB;
@@ -387,15 +843,51 @@ WC_ENCODING: Final = """
 # """
 WC_ORDERED_ENCODING: Final = """
 :- truth_degree(V), V > 0, val_phi(V,LB,UB);
-   weighted_typicality_inclusion(C,_,_), individual(X);
+   wc_node(C), individual(X);
    #sum{
        @str_to_int(W),D,VD : weighted_typicality_inclusion(C,D,W), eval_ge(D,X,VD)
    } > LB;
    not eval_ge(C,X,V).
 :- truth_degree(V), V > 0, val_phi(V,LB,UB);
-   weighted_typicality_inclusion(C,_,_), individual(X);
+   wc_node(C), individual(X);
    not #sum{
        @str_to_int(W),D,VD : weighted_typicality_inclusion(C,D,W), eval_ge(D,X,VD)
    } > LB;
    eval_ge(C,X,V).
 """
+
+SESSION_WC_WEIGHTS: Final = """
+% weights of sessions start at version 0, and each node is active while the external atom of its version is true
+session_weight(C,D,@str_to_int(W),0) :- weighted_typicality_inclusion(C,D,W).
+#external session_active(C,0) : weighted_typicality_inclusion(C,_,_).
+"""
+
+SESSION_WC_ENCODING: Final = """
+:- truth_degree(V), val_phi(V,LB,UB);
+   session_active(C,VERSION), individual(X);
+   LB < #sum{
+       W * VD,D,VD : session_weight(C,D,W,VERSION), eval(D,X,VD), VD > 0
+   } <= UB;
+   not eval(C,X,V).
+:- truth_degree(V), val_phi(V,LB,UB);
+   session_active(C,VERSION), individual(X);
+   not LB < #sum{
+       W * VD,D,VD : session_weight(C,D,W,VERSION), eval(D,X,VD), VD > 0
+   } <= UB;
+   eval(C,X,V).
+"""
+
+SESSION_WC_ORDERED_ENCODING: Final = """
+:- truth_degree(V), V > 0, val_phi(V,LB,UB);
+   session_active(C,VERSION), individual(X);
+   #sum{
+       W,D,VD : session_weight(C,D,W,VERSION), eval_ge(D,X,VD)
+   } > LB;
+   not eval_ge(C,X,V).
+:- truth_degree(V), V > 0, val_phi(V,LB,UB);
+   session_active(C,VERSION), individual(X);
+   not #sum{
+       W,D,VD : session_weight(C,D,W,VERSION), eval_ge(D,X,VD)
+   } > LB;
+   eval_ge(C,X,V).
+"""
@@ -0,0 +1,92 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple, Iterator
+
+from dumbo_utils.validation import validate
+
+from valphi.controllers import Controller
+from valphi.networks import NetworkTopology
+from valphi.utils import frozendict
+
+Cube = List[Tuple[str, int]]
+
+
+def make_cubes(controller: Controller, number_of_cubes: int, nodes: Optional[List[str]] = None) -> List[Cube]:
+    """
+    Split the search space into (at least number_of_cubes, if possible) cubes, each one assigning a truth degree to some
+    of the given nodes (by default, the input nodes) for the anonymous individual.
+
+    Exactly-one groups of the input layer are split on the element with the maximum truth degree, and the other nodes on
+    their truth degree. Hence, cubes are disjoint and cover all solutions (some cubes may have no solution).
+    """
+    validate("number_of_cubes", number_of_cubes, min_value=1)
+    network = controller.network
+    if nodes is None:
+        nodes = network.input_nodes()
+    crisp = {str(atom.arguments[0]) for atom in network.network_facts if atom.predicate_name == "crisp"}
+
+    splitters = []
+    grouped = set()
+    if type(network) is NetworkTopology:
+        for index in range(network.number_of_exactly_one()):
+            group = [network.term(1, node) for node in network.nodes_in_exactly_one(index)]
+            if all(node in nodes for node in group):
+                grouped.update(group)
+                splitters.append([[(node, controller.max_value)] for node in group])
+    for node in nodes:
+        if node not in grouped:
+            values = [0, controller.max_value] if node in crisp else range(controller.max_value + 1)
+            splitters.append([[(node, value)] for value in values])
+
+    res: List[Cube] = [[]]
+    for alternatives in splitters:
+        if len(res) >= number_of_cubes:
+            break
+        res = [cube + alternative for cube in res for alternative in alternatives]
+    return res
+
+
+def find_solutions(controller: Controller, projection: Optional[List[str]] = None, max_workers: Optional[int] = None,
+                   number_of_cubes: Optional[int] = None) -> Iterator[frozendict]:
+    """
+    Enumerate the solutions (see Controller.find_solutions) by solving cubes in parallel processes.
+    Solutions are yielded in the order of the cubes, as soon as a cube and all the cubes before it are solved.
+    """
+    yield from itertools.chain.from_iterable(
+        _map(_find_solutions, controller, projection, max_workers, number_of_cubes)
+    )
+
+
+def count_solutions(controller: Controller, projection: Optional[List[str]] = None, max_workers: Optional[int] = None,
+                    number_of_cubes: Optional[int] = None) -> int:
+    """
+    Count the solutions (see Controller.count_solutions) by solving cubes in parallel processes.
+    """
+    return sum(_map(_count_solutions, controller, projection, max_workers, number_of_cubes))
+
+
+def _map(function, controller: Controller, projection: Optional[List[str]], max_workers: Optional[int],
+         number_of_cubes: Optional[int]) -> Iterator:
+    if max_workers is not None:
+        validate("max_workers", max_workers, min_value=1)
+    if number_of_cubes is None:
+        number_of_cubes = 4 * (max_workers or os.cpu_count() or 1)
+    # projected solutions are split on projected nodes, so that cubes do not share them
+    cubes = make_cubes(controller, number_of_cubes, projection)
+    if max_workers == 1 or len(cubes) == 1:
+        yield from (function(controller, projection, cube) for cube in cubes)
+        return
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        yield from executor.map(function, itertools.repeat(controller), itertools.repeat(projection), cubes)
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def _find_solutions(controller: Controller, projection: Optional[List[str]], cube: Cube) -> List[frozendict]:
+    return controller.find_solutions(projection=projection, cube=cube)
+
+
+def _count_solutions(controller: Controller, projection: Optional[List[str]], cube: Cube) -> int:
+    return controller.count_solutions(projection=projection, cube=cube).count
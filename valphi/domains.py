@@ -0,0 +1,124 @@
+import math
+from collections import defaultdict
+from typing import Dict, Tuple, List, Optional
+
+import clingo
+import clingo.ast
+from dumbo_utils.validation import validate
+
+from valphi.networks import NetworkInterface
+
+Interval = Tuple[int, int]
+
+
+def interval_of_operator(operator: str, alpha: str, max_value: int) -> Optional[Interval]:
+    """
+    The truth degrees V in 0..max_value such that `V operator alpha` holds (as in Context.apply_operator),
+    or None if the operator cannot be expressed as an interval.
+    """
+    threshold = float(alpha) * max_value
+    if operator == ">=":
+        return math.ceil(threshold), max_value
+    if operator == ">":
+        return math.floor(threshold) + 1, max_value
+    if operator == "<=":
+        return 0, math.floor(threshold)
+    if operator == "<":
+        return 0, math.ceil(threshold) - 1
+    if operator == "=":
+        return math.ceil(threshold), math.floor(threshold)
+    return None
+
+
+def intersect(first: Interval, second: Interval) -> Interval:
+    return max(first[0], second[0]), min(first[1], second[1])
+
+
+def read_static_facts(raw_code: str, predicates: List[str]) -> List[clingo.Symbol]:
+    """
+    Facts of the given predicates (of arity 4) that occur as such in raw_code.
+    Derived atoms are ignored, as they may depend on other parts of the program.
+    """
+    res = []
+
+    def collect(statement):
+        if statement.ast_type != clingo.ast.ASTType.Rule or statement.body:
+            return
+        head = statement.head
+        if head.ast_type != clingo.ast.ASTType.Literal or head.sign != clingo.ast.Sign.NoSign:
+            return
+        atom = head.atom
+        if atom.ast_type != clingo.ast.ASTType.SymbolicAtom:
+            return
+        term = atom.symbol
+        if term.ast_type != clingo.ast.ASTType.Function or term.name not in predicates or len(term.arguments) != 4:
+            return
+        try:
+            res.append(clingo.parse_term(str(term)))
+        except RuntimeError:
+            pass
+
+    clingo.ast.parse_string(raw_code, collect)
+    return res
+
+
+def _is_named(term: clingo.Symbol) -> bool:
+    return term.type == clingo.SymbolType.Function and term.name not in ["top", "bot", "and", "or", "neg", "impl"]
+
+
+def static_restrictions(raw_code: str, max_value: int) -> Tuple[Dict[str, Interval], Dict[str, Dict[str, Interval]]]:
+    """
+    Restrictions on the truth degrees of named concepts that can be read from the TBox and ABox facts in raw_code.
+    The first dictionary applies to all individuals, the second one maps individuals to their own restrictions.
+    """
+    restrictions = {}
+    individual_restrictions = defaultdict(dict)
+
+    def restrict(target: Dict[str, Interval], concept: clingo.Symbol, interval: Optional[Interval]) -> None:
+        if interval is None or not _is_named(concept):
+            return
+        key = str(concept)
+        target[key] = intersect(target.get(key, (0, max_value)), interval)
+
+    for fact in read_static_facts(raw_code, ["concept_inclusion", "assertion"]):
+        if any(argument.type != clingo.SymbolType.String for argument in fact.arguments[2:]):
+            continue
+        operator, alpha = fact.arguments[2].string, fact.arguments[3].string
+        if fact.name == "assertion":
+            individual = fact.arguments[1]
+            restrict(individual_restrictions[str(individual)], fact.arguments[0], interval_of_operator(
+                operator, alpha, max_value))
+            continue
+        left, right = fact.arguments[0], fact.arguments[1]
+        if operator == "=":
+            operator = ">="
+        if operator not in [">=", ">"]:
+            continue  # the other operators are enforced on their own anonymous individuals
+        if left == clingo.Function("top"):
+            # impl(top,D) evaluates to D
+            restrict(restrictions, right, interval_of_operator(operator, alpha, max_value))
+        elif right == clingo.Function("bot") and (operator == ">" or float(alpha) * max_value > 0):
+            # impl(C,bot) evaluates to max_value if C is 0, and to 0 otherwise
+            restrict(restrictions, left, (0, 0))
+    return restrictions, dict(individual_restrictions)
+
+
+def domain_facts(network: NetworkInterface, val_phi: List[float], raw_code: str) -> List[str]:
+    """
+    Facts domain(C,L,U) and individual_domain(C,X,L,U) restricting each named concept C to the truth degrees L..U,
+    as obtained by propagating the static restrictions through the network by interval arithmetic.
+    """
+    max_value = len(val_phi)
+    validate("max_value", max_value, min_value=1)
+    restrictions, individual_restrictions = static_restrictions(raw_code, max_value)
+    bounds = network.propagate_bounds(val_phi, restrictions)
+    res = [f"domain({concept},{lower},{upper})." for concept, (lower, upper) in bounds.items()
+           if (lower, upper) != (0, max_value)]
+    for individual, restriction in individual_restrictions.items():
+        for concept, interval in restrictions.items():
+            restriction[concept] = intersect(restriction.get(concept, (0, max_value)), interval)
+        individual_bounds = network.propagate_bounds(val_phi, restriction)
+        res.extend(f"individual_domain({concept},{individual},{lower},{upper})."
+                   for concept, (lower, upper) in individual_bounds.items()
+                   if (lower, upper) != bounds.get(concept, (0, max_value)))
+    return res
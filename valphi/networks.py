@@ -1,16 +1,65 @@
 import dataclasses
+import re
 from copy import deepcopy
-from typing import List, Tuple, Optional, Union, Any, Set, FrozenSet
+from functools import cached_property
+from pathlib import Path
+from typing import List, Tuple, Optional, Union, Any, Set, FrozenSet, Dict
 
 import clingo
+import numpy as np
 import typeguard
-from distlib.util import cached_property
 from dumbo_utils.validation import validate
 
+from valphi.containers import is_container, read_container, write_container
 from valphi.models import Model
 from valphi.propagators import ValPhiPropagator
 
 
+def _is_sparse(matrix: Any) -> bool:
+    return hasattr(matrix, "tocsr")
+
+
+def _dense(matrix: Any) -> np.ndarray:
+    return matrix.toarray() if _is_sparse(matrix) else matrix
+
+
+def _dense_row(matrix: Any, row: int) -> np.ndarray:
+    return matrix.getrow(row).toarray()[0] if _is_sparse(matrix) else matrix[row]
+
+
+def _weight_to_str(weight: float) -> str:
+    return str(int(weight)) if float(weight).is_integer() else str(weight)
+
+
+def _sum_tolerance(val_phi: List[float], weights: np.ndarray, bias: np.ndarray, max_value: int) -> np.ndarray:
+    """
+    Bound on the floating-point error of weighted sums (zero if everything is integer, hence computed exactly).
+    """
+    if all(float(value).is_integer() for value in val_phi) and np.all(np.mod(weights, 1) == 0) \
+            and np.all(np.mod(bias, 1) == 0):
+        return np.zeros(len(bias))
+    return 1e-9 * (1 + np.abs(bias) + np.abs(weights) @ np.full(weights.shape[1], max_value))
+
+
+def _degrees_of_sums(val_phi: List[float], lower_sums: np.ndarray, upper_sums: np.ndarray,
+                     tolerance: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Truth degrees of weighted sums (the index of the first ValPhi value greater than or equal to the sum).
+    Sums are widened by tolerance to account for floating-point errors.
+    """
+    breakpoints = np.asarray(val_phi, dtype=float)
+    return (np.searchsorted(breakpoints, lower_sums - tolerance, side="left"),
+            np.searchsorted(breakpoints, upper_sums + tolerance, side="left"))
+
+
+def _apply_bounds(terms: List[str], lower: np.ndarray, upper: np.ndarray,
+                  bounds: Dict[str, Tuple[int, int]]) -> None:
+    for index, term in enumerate(terms):
+        if term in bounds:
+            lower[index] = max(lower[index], bounds[term][0])
+            upper[index] = min(upper[index], bounds[term][1])
+
+
 @typeguard.typechecked
 @dataclasses.dataclass(frozen=True)
 class NetworkInterface:
@@ -19,7 +68,12 @@ class NetworkInterface:
     __parse_key = object()
 
     @staticmethod
-    def parse(s: Union[str, List[str]]) -> 'NetworkInterface':
+    def parse(s: Union[str, List[str], Path]) -> 'NetworkInterface':
+        if isinstance(s, Path):
+            if is_container(s):
+                return NetworkInterface.__parse_container(s)
+            with open(s) as f:
+                s = f.readlines()
         if type(s) == str:
             lines = [x.strip().replace('\t', ' ') for x in s.strip().split('\n')]
         else:
@@ -31,6 +85,29 @@ class NetworkInterface:
             res = NetworkTopology.parse_implementation(lines, NetworkInterface.__parse_key)
         return res
 
+    @staticmethod
+    def __parse_container(path: Path) -> 'NetworkInterface':
+        kind, metadata, arrays = read_container(path)
+        validate("kind", kind, is_in=[NetworkTopology.__name__, ArgumentationGraph.__name__])
+        if kind == NetworkTopology.__name__:
+            return NetworkTopology.parse_container_implementation(metadata, arrays, NetworkInterface.__parse_key)
+        return ArgumentationGraph.parse_container_implementation(metadata, arrays, NetworkInterface.__parse_key)
+
+    def save_binary(self, path: Path) -> None:
+        self.validate_is_complete()
+        metadata, arrays = self._as_container()
+        write_container(path, type(self).__name__, metadata, arrays)
+
+    def _as_container(self) -> Tuple[dict, dict]:
+        raise ValueError(f"{type(self).__name__} cannot be stored in binary format")
+
+    def serialize(self) -> str:
+        self.validate_is_complete()
+        return self._serialize()
+
+    def _serialize(self) -> str:
+        raise NotImplemented
+
     def complete(self):
         validate("complete", self.__complete[0], equals=False)
         self.__complete[0] = True
@@ -54,11 +131,16 @@ class NetworkInterface:
     def _network_facts(self) -> Model:
         raise NotImplemented
 
-    def register_propagators(self, control: clingo.Control, val_phi: List[float]) -> None:
+    def register_propagators(self, control: clingo.Control, val_phi: List[float],
+                             nodes: Optional[Set[str]] = None) -> List[ValPhiPropagator]:
+        """
+        Register a propagator for each node with inputs (only for the given nodes, if any).
+        """
         self.validate_is_complete()
-        return self._register_propagators(control, val_phi)
+        return self._register_propagators(control, val_phi, nodes)
 
-    def _register_propagators(self, control: clingo.Control, val_phi: List[float]) -> None:
+    def _register_propagators(self, control: clingo.Control, val_phi: List[float],
+                              nodes: Optional[Set[str]]) -> List[ValPhiPropagator]:
         raise NotImplemented
 
     @cached_property
@@ -76,6 +158,38 @@ class NetworkInterface:
         self.validate_is_complete()
         return self._as_attack_graph()
 
+    def propagate_bounds(self, val_phi: List[float], bounds: Dict[str, Tuple[int, int]]) -> Dict[str, Tuple[int, int]]:
+        """
+        Intervals of truth degrees reachable by the nodes of the network (and by the other concepts in bounds),
+        computed by interval arithmetic from the given bounds (by default, 0..len(val_phi)).
+        """
+        self.validate_is_complete()
+        return self._propagate_bounds(val_phi, bounds)
+
+    def _propagate_bounds(self, val_phi: List[float], bounds: Dict[str, Tuple[int, int]]) -> Dict[str, Tuple[int, int]]:
+        return dict(bounds)
+
+    def cone_of_influence(self, concepts: Set[str]) -> "NetworkInterface":
+        """
+        The sub-network of the nodes on which the given concepts depend (the network itself if it cannot be sliced).
+        Nodes outside the cone must be irrelevant, i.e., any assignment of the cone extends to the whole network.
+        """
+        self.validate_is_complete()
+        return self._cone_of_influence(concepts)
+
+    def _cone_of_influence(self, concepts: Set[str]) -> "NetworkInterface":
+        return self
+
+    def input_nodes(self) -> List[str]:
+        """
+        The nodes without inputs (i.e., the input layer), whose truth degrees are chosen rather than computed.
+        """
+        self.validate_is_complete()
+        return self._input_nodes()
+
+    def _input_nodes(self) -> List[str]:
+        return []
+
     def _as_attack_graph(self) -> Model:
         raise NotImplemented
 
@@ -89,8 +203,9 @@ class EmptyNetwork(NetworkInterface):
     def _network_facts(self) -> Model:
         return Model.empty()
 
-    def _register_propagators(self, control: clingo.Control, val_phi: List[float]) -> None:
-        pass
+    def _register_propagators(self, control: clingo.Control, val_phi: List[float],
+                              nodes: Optional[Set[str]]) -> List[ValPhiPropagator]:
+        return []
 
     def _approximate(self, multiplier: int) -> "NetworkInterface":
         return self
@@ -102,37 +217,118 @@ class EmptyNetwork(NetworkInterface):
 @typeguard.typechecked
 @dataclasses.dataclass(frozen=True)
 class NetworkTopology(NetworkInterface):
-    __layers: List[List[List[float]]] = dataclasses.field(default_factory=list, init=False)
+    __weights: List[Any] = dataclasses.field(default_factory=list, init=False)
+    __biases: List[np.ndarray] = dataclasses.field(default_factory=list, init=False)
+    __pending_nodes: List[List[float]] = dataclasses.field(default_factory=list, init=False)
     __crisp_layers: set[int] = dataclasses.field(default_factory=set, init=False)
     __exactly_one: List[List[int]] = dataclasses.field(default_factory=list, init=False)
+    __active_nodes: List[np.ndarray] = dataclasses.field(default_factory=list, init=False)
 
     @staticmethod
     def parse_implementation(lines: List[str], key: Any) -> 'NetworkTopology':
         NetworkInterface.validate_parse_key(key)
-        res = NetworkTopology().add_layer()
+        blocks = [[]]
+        exactly_one = []
+        crisp_layers = []
         for line in lines:
             if not line:
                 continue
             if line == '#':
-                res.add_layer()
+                blocks.append([])
                 continue
             if line.startswith("=1 "):
-                res.add_exactly_one([int(x) for x in line.split()[1:]])
+                exactly_one.append([int(x) for x in line.split()[1:]])
                 continue
             if line.startswith("crisp "):
-                res.crisp_layer(int(line.split(' ', maxsplit=1)[1]))
+                crisp_layers.append(int(line.split(' ', maxsplit=1)[1]))
                 continue
-            weights = [float(x) for x in line.split()]
-            if len(res.__layers) == 1:
-                for _ in weights[1:]:
+            blocks[-1].append(line)
+
+        res = NetworkTopology().add_layer()
+        if not blocks[0]:
+            blocks.pop(0)
+        for block in blocks:
+            if block:
+                matrix = np.loadtxt(block, dtype=float, ndmin=2)
+            else:
+                matrix = np.empty((0, 1 + len(res.__biases[-1])))
+            if len(res.__biases) == 1:
+                for _ in range(matrix.shape[1] - 1):
                     res.add_node()
-                res.add_layer()
-            res.add_node(weights)
+            res.add_weights(matrix[:, 1:], matrix[:, 0])
+        for input_nodes in exactly_one:
+            res.add_exactly_one(input_nodes)
+        for index in crisp_layers:
+            res.crisp_layer(index)
+        return res.complete()
+
+    @staticmethod
+    def parse_container_implementation(metadata: dict, arrays: dict, key: Any) -> 'NetworkTopology':
+        NetworkInterface.validate_parse_key(key)
+        res = NetworkTopology().add_layer()
+        for _ in range(metadata["input_nodes"]):
+            res.add_node()
+        previous_nodes = metadata["input_nodes"]
+        for index, layer in enumerate(metadata["layers"], start=2):
+            bias = arrays[f"bias_{index}"]
+            if layer == "csr":
+                from scipy.sparse import csr_matrix
+                weights = csr_matrix(
+                    (arrays[f"data_{index}"], arrays[f"indices_{index}"], arrays[f"indptr_{index}"]),
+                    shape=(len(bias), previous_nodes),
+                    copy=False,
+                )
+            else:
+                weights = arrays[f"weights_{index}"]
+            res.add_weights(weights, bias)
+            previous_nodes = len(bias)
+        for input_nodes in metadata["exactly_one"]:
+            res.add_exactly_one(input_nodes)
+        for index in metadata["crisp_layers"]:
+            res.crisp_layer(index)
         return res.complete()
 
+    def complete(self):
+        self.__flush_pending_nodes()
+        return super().complete()
+
+    def __flush_pending_nodes(self) -> None:
+        if not self.__pending_nodes:
+            return
+        layer = len(self.__weights) - 1
+        matrix = np.array(self.__pending_nodes, dtype=float).reshape(len(self.__pending_nodes), -1)
+        if layer > 0:
+            self.__weights[layer] = np.vstack([self.__weights[layer], matrix[:, 1:]])
+            self.__biases[layer] = np.concatenate([self.__biases[layer], matrix[:, 0]])
+        else:
+            self.__weights[layer] = np.empty((self.__weights[layer].shape[0] + matrix.shape[0], 0))
+            self.__biases[layer] = np.zeros(self.__weights[layer].shape[0])
+        self.__pending_nodes.clear()
+
     def add_layer(self) -> 'NetworkTopology':
         self.validate_is_not_complete()
-        self.__layers.append([])
+        self.__flush_pending_nodes()
+        previous_nodes = self.__weights[-1].shape[0] if self.__weights else 0
+        self.__weights.append(np.empty((0, previous_nodes)))
+        self.__biases.append(np.empty(0))
+        return self
+
+    def add_weights(self, weights: Any, bias: Any) -> 'NetworkTopology':
+        """
+        Add a layer whose nodes are given by the rows of the (dense or scipy.sparse) weights matrix.
+        Column j holds the influence of node j+1 of the previous layer, and bias[i] is the bias of node i+1.
+        """
+        self.validate_is_not_complete()
+        validate("has layer", self.__weights, min_len=1)
+        self.__flush_pending_nodes()
+        if not _is_sparse(weights):
+            weights = np.asanyarray(weights, dtype=float)
+        bias = np.asanyarray(bias, dtype=float)
+        validate("weights", len(weights.shape), equals=2)
+        validate("weights", weights.shape[1], equals=self.__weights[-1].shape[0])
+        validate("bias", bias.shape, equals=(weights.shape[0],))
+        self.__weights.append(weights)
+        self.__biases.append(bias)
         return self
 
     def crisp_layer(self, index: int) -> 'NetworkTopology':
@@ -140,46 +336,120 @@ class NetworkTopology(NetworkInterface):
         self.__crisp_layers.add(index)
         return self
 
+    def _as_container(self) -> Tuple[dict, dict]:
+        metadata = {
+            "input_nodes": self.number_of_nodes(layer=1),
+            "layers": [],
+            "exactly_one": [list(nodes) for nodes in self.__exactly_one],
+            "crisp_layers": sorted(self.__crisp_layers),
+        }
+        arrays = {}
+        for index in range(2, self.number_of_layers() + 1):
+            weights = self.__get_layer(index)
+            arrays[f"bias_{index}"] = self.__biases[index - 1]
+            if _is_sparse(weights):
+                weights = weights.tocsr()
+                metadata["layers"].append("csr")
+                arrays[f"data_{index}"] = weights.data.astype(float)
+                arrays[f"indices_{index}"] = weights.indices.astype(np.int64)
+                arrays[f"indptr_{index}"] = weights.indptr.astype(np.int64)
+            else:
+                metadata["layers"].append("dense")
+                arrays[f"weights_{index}"] = weights
+        return metadata, arrays
+
+    def _serialize(self) -> str:
+        res = []
+        for index in range(2, self.number_of_layers() + 1):
+            if index > 2:
+                res.append("#")
+            for bias, edges in self.__in_edges(index, with_zeros=True):
+                res.append(' '.join(_weight_to_str(weight) for weight in [bias] + [weight for _, weight in edges]))
+        for nodes in self.__exactly_one:
+            res.append(' '.join(["=1"] + [str(node) for node in nodes]))
+        for index in sorted(self.__crisp_layers):
+            res.append(f"crisp {index}")
+        return '\n'.join(res) + '\n'
+
     def add_node(self, weights: Optional[List[float]] = None) -> 'NetworkTopology':
         self.validate_is_not_complete()
-        validate("has layer", self.__layers, min_len=1)
-        if len(self.__layers) == 1:
+        validate("has layer", self.__weights, min_len=1)
+        if len(self.__weights) == 1:
             validate("weights", weights, enforce_not_none=False, equals=None)
-            self.__layers[-1].append([])
+            self.__pending_nodes.append([])
         else:
-            validate("weights", weights, length=1 + len(self.__layers[-2]))
-            self.__layers[-1].append(weights)
+            validate("weights", weights, length=1 + self.__weights[-2].shape[0])
+            self.__pending_nodes.append(weights)
         return self
 
     def add_exactly_one(self, input_nodes: List[int]) -> 'NetworkTopology':
         self.validate_is_not_complete()
-        validate("has layer", self.__layers, min_len=1)
-        weights = self.__get_layer(1)
-        validate("has nodes", all(1 <= node <= len(weights) for node in input_nodes), equals=True)
+        validate("has layer", self.__weights, min_len=1)
+        self.__flush_pending_nodes()
+        nodes = self.__get_layer(1).shape[0]
+        validate("has nodes", all(1 <= node <= nodes for node in input_nodes), equals=True)
         self.__exactly_one.append(input_nodes)
         return self
 
     def __validate_layer_index(self, index) -> None:
-        validate("index", index, min_value=1, max_value=len(self.__layers))
+        validate("index", index, min_value=1, max_value=len(self.__weights))
 
-    def __get_layer(self, index) -> List[List[float]]:
+    def __get_layer(self, index) -> Any:
         self.__validate_layer_index(index)
-        return self.__layers[index - 1]
+        return self.__weights[index - 1]
+
+    def __eq__(self, other):
+        if type(other) is not NetworkTopology:
+            return NotImplemented
+        if self.number_of_layers() != other.number_of_layers():
+            return False
+        for layer in range(1, self.number_of_layers() + 1):
+            if not np.array_equal(_dense(self.layer_weights(layer)), _dense(other.layer_weights(layer))):
+                return False
+            if not np.array_equal(self.layer_bias(layer), other.layer_bias(layer)):
+                return False
+        if self.__crisp_layers != other.__crisp_layers or self.__exactly_one != other.__exactly_one:
+            return False
+        return all(np.array_equal(self.__active(layer), other.__active(layer))
+                   for layer in range(1, self.number_of_layers() + 1))
 
     def number_of_layers(self) -> int:
         self.validate_is_complete()
-        return len(self.__layers)
+        return len(self.__weights)
 
     def number_of_nodes(self, layer: int) -> int:
         self.validate_is_complete()
-        weights = self.__get_layer(layer)
-        return len(weights)
+        return self.__get_layer(layer).shape[0]
+
+    def layer_weights(self, layer: int) -> Any:
+        self.validate_is_complete()
+        return self.__get_layer(layer)
+
+    def layer_bias(self, layer: int) -> np.ndarray:
+        self.validate_is_complete()
+        self.__validate_layer_index(layer)
+        return self.__biases[layer - 1]
 
     def in_weights(self, layer: int, node: int) -> List[float]:
         self.validate_is_complete()
         weights = self.__get_layer(layer)
-        validate("node", node, min_value=1, max_value=len(weights))
-        return weights[node - 1]
+        validate("node", node, min_value=1, max_value=weights.shape[0])
+        if layer == 1:
+            return []
+        return [self.__biases[layer - 1][node - 1].item()] + _dense_row(weights, node - 1).tolist()
+
+    def __active(self, layer: int) -> np.ndarray:
+        if not self.__active_nodes:
+            return np.ones(self.__get_layer(layer).shape[0], dtype=bool)
+        return self.__active_nodes[layer - 1]
+
+    def is_active(self, layer: int, node: int) -> bool:
+        self.validate_is_complete()
+        return bool(self.__active(layer)[node - 1])
+
+    def is_crisp_layer(self, layer: int) -> bool:
+        self.validate_is_complete()
+        return layer in self.__crisp_layers
 
     def number_of_exactly_one(self) -> int:
         self.validate_is_complete()
@@ -198,59 +468,166 @@ class NetworkTopology(NetworkInterface):
     def layer_term(layer: int) -> str:
         return f"l{layer}"
 
+    def __in_edges(self, layer: int, with_zeros: bool = False) -> List[Tuple[float, List[Tuple[int, float]]]]:
+        """
+        For each node of the given layer (not the input layer), its bias and the list of (input node, weight) pairs.
+        Zero weights of sparse layers are omitted unless with_zeros is set.
+        """
+        weights = self.__get_layer(layer)
+        biases = self.__biases[layer - 1].tolist()
+        if _is_sparse(weights) and with_zeros:
+            weights = weights.toarray()
+        if _is_sparse(weights):
+            weights = weights.tocsr()
+            return [
+                (bias, list(zip(
+                    (weights.indices[weights.indptr[row]:weights.indptr[row + 1]] + 1).tolist(),
+                    weights.data[weights.indptr[row]:weights.indptr[row + 1]].tolist(),
+                )))
+                for row, bias in enumerate(biases)
+            ]
+        return [
+            (bias, list(enumerate(row, start=1)))
+            for bias, row in zip(biases, weights.tolist())
+        ]
+
     def _network_facts(self) -> Model:
         res = []
-        for layer_index, _ in enumerate(range(self.number_of_layers()), start=1):
-            for node_index, _ in enumerate(range(self.number_of_nodes(layer=layer_index)), start=1):
-                if layer_index in self.__crisp_layers:
-                    res.append(f"crisp({self.term(layer_index, node_index)}).")
-                weights = self.in_weights(layer=layer_index, node=node_index)
-                if weights:
-                    res.append(f"weighted_typicality_inclusion({self.term(layer_index, node_index)},"
-                               f"top,\"{weights[0]}\").")
-                    for weight_index, weight in enumerate(weights[1:], start=1):
-                        res.append(
-                            f"weighted_typicality_inclusion({self.term(layer_index, node_index)},"
-                            f"{self.term(layer_index - 1, weight_index)},\"{weight}\").")
+        for layer_index in range(1, self.number_of_layers() + 1):
+            active = self.__active(layer_index)
+            terms = [self.term(layer_index, node_index)
+                     for node_index in range(1, self.number_of_nodes(layer=layer_index) + 1)]
+            if layer_index in self.__crisp_layers:
+                res.extend(f"crisp({term})." for term, is_active in zip(terms, active) if is_active)
+            if layer_index == 1:
+                continue
+            previous_layer = self.layer_term(layer_index - 1)
+            previous_active = self.__active(layer_index - 1)
+            for term, is_active, (bias, edges) in zip(terms, active, self.__in_edges(layer_index)):
+                if not is_active:
+                    continue
+                res.append(f"weighted_typicality_inclusion({term},top,\"{_weight_to_str(bias)}\").")
+                res.extend(
+                    f"weighted_typicality_inclusion({term},{previous_layer}_{node},\"{_weight_to_str(weight)}\")."
+                    for node, weight in edges if previous_active[node - 1]
+                )
         for index in range(self.number_of_exactly_one()):
             nodes = self.nodes_in_exactly_one(index)
+            if not self.__active(1)[nodes[0] - 1]:
+                continue
             res.append(f"exactly_one({index}).")
             for node in nodes:
                 res.append(f"exactly_one_element({index},{self.term(1, node)}).")
         return Model.of_program(res)
 
-    def _register_propagators(self, control: clingo.Control, val_phi: List[float]) -> None:
-        for layer_index, _ in enumerate(range(1, self.number_of_layers()), start=2):
-            for node_index, _ in enumerate(range(self.number_of_nodes(layer=layer_index)), start=1):
-                propagator = ValPhiPropagator(self.term(layer_index, node_index), val_phi=val_phi)
+    def _register_propagators(self, control: clingo.Control, val_phi: List[float],
+                              nodes: Optional[Set[str]]) -> List[ValPhiPropagator]:
+        res = []
+        top = clingo.Function("top")
+        for layer_index in range(2, self.number_of_layers() + 1):
+            input_terms = [clingo.Function(self.term(layer_index - 1, node_index))
+                           for node_index in range(1, self.number_of_nodes(layer=layer_index - 1) + 1)]
+            active = self.__active(layer_index)
+            for node_index, (bias, edges) in enumerate(self.__in_edges(layer_index), start=1):
+                if not active[node_index - 1] or (nodes is not None and self.term(layer_index, node_index) not in nodes):
+                    continue
+                input_weights = {input_terms[node - 1]: weight for node, weight in edges}
+                input_weights[top] = bias
+                propagator = ValPhiPropagator(self.term(layer_index, node_index), val_phi=val_phi,
+                                              input_weights=input_weights)
                 control.register_propagator(propagator)
+                res.append(propagator)
+        return res
+
+    def _propagate_bounds(self, val_phi: List[float], bounds: Dict[str, Tuple[int, int]]) -> Dict[str, Tuple[int, int]]:
+        max_value = len(val_phi)
+        res = dict(bounds)
+        lower, upper = None, None
+        for layer_index in range(1, self.number_of_layers() + 1):
+            nodes = self.number_of_nodes(layer=layer_index)
+            if layer_index == 1:
+                lower = np.zeros(nodes, dtype=np.int64)
+                upper = np.full(nodes, max_value, dtype=np.int64)
+            else:
+                weights = _dense(self.__get_layer(layer_index))
+                bias = self.__biases[layer_index - 1] * max_value
+                positive, negative = np.maximum(weights, 0), np.minimum(weights, 0)
+                tolerance = _sum_tolerance(val_phi, weights, bias, max_value)
+                lower, upper = _degrees_of_sums(
+                    val_phi, bias + positive @ lower + negative @ upper, bias + positive @ upper + negative @ lower,
+                    tolerance,
+                )
+            terms = [self.term(layer_index, node_index) for node_index in range(1, nodes + 1)]
+            _apply_bounds(terms, lower, upper, bounds)
+            if layer_index in self.__crisp_layers:
+                lower = np.where(lower > 0, max_value, lower)
+                upper = np.where(upper < max_value, 0, upper)
+            res.update(zip(terms, zip(lower.tolist(), upper.tolist())))
+        return res
 
     def _approximate(self, multiplier: int) -> "NetworkInterface":
         res = NetworkTopology()
-        res.__layers.extend(
-            [
-                [round(weight * multiplier) for weight in node]
-                for node in layer
-            ]
-            for layer in self.__layers
-        )
+        for weights, bias in zip(self.__weights, self.__biases):
+            res.__weights.append((weights * multiplier).rint() if _is_sparse(weights)
+                                 else np.rint(weights * multiplier))
+            res.__biases.append(np.rint(bias * multiplier))
+        res.__exactly_one.extend(deepcopy(self.__exactly_one))
+        res.__crisp_layers.update(self.__crisp_layers)
+        res.__active_nodes.extend(self.__active_nodes)
+        return res.complete()
+
+    def _cone_of_influence(self, concepts: Set[str]) -> "NetworkTopology":
+        active = [np.zeros(self.number_of_nodes(layer=layer), dtype=bool)
+                  for layer in range(1, self.number_of_layers() + 1)]
+        for concept in concepts:
+            match = re.fullmatch(r"l([0-9]+)_([0-9]+)", concept)
+            if match:
+                layer, node = int(match.group(1)), int(match.group(2))
+                if 1 <= layer <= len(active) and 1 <= node <= len(active[layer - 1]):
+                    active[layer - 1][node - 1] = True
+        # crisp nodes may be inconsistent with some inputs, hence they constrain the network
+        for layer in self.__crisp_layers:
+            if layer > 1:
+                active[layer - 1][:] = True
+        for layer in range(self.number_of_layers(), 1, -1):
+            weights = self.__get_layer(layer)
+            rows = weights[np.flatnonzero(active[layer - 1])]
+            active[layer - 2] |= np.asarray(abs(rows).sum(axis=0)).ravel() != 0
+        for nodes in self.__exactly_one:
+            if any(active[0][node - 1] for node in nodes):
+                for node in nodes:
+                    active[0][node - 1] = True
+
+        res = NetworkTopology()
+        res.__weights.extend(self.__weights)
+        res.__biases.extend(self.__biases)
         res.__exactly_one.extend(deepcopy(self.__exactly_one))
         res.__crisp_layers.update(self.__crisp_layers)
+        res.__active_nodes.extend(
+            layer_active & self.__active(layer) for layer, layer_active in enumerate(active, start=1)
+        )
         return res.complete()
 
+    def _input_nodes(self) -> List[str]:
+        return [self.term(1, node) for node in range(1, self.number_of_nodes(layer=1) + 1)]
+
     def _as_attack_graph(self) -> Model:
         res = []
-        for layer_index, _ in enumerate(range(self.number_of_layers()), start=1):
-            for node_index, _ in enumerate(range(self.number_of_nodes(layer=layer_index)), start=1):
-                weights = self.in_weights(layer=layer_index, node=node_index)
-                term = self.term(layer_index, node_index)
+        for layer_index in range(1, self.number_of_layers() + 1):
+            terms = [self.term(layer_index, node_index)
+                     for node_index in range(1, self.number_of_nodes(layer=layer_index) + 1)]
+            for node_index, term in enumerate(terms, start=1):
                 res.append(f"layer({term},{layer_index}).")
                 res.append(f"index({term},{node_index}).")
-                if weights:
-                    res.append(f"attack({term},top,\"{weights[0]}\").")
-                    for weight_index, weight in enumerate(weights[1:], start=1):
-                        res.append(
-                            f"attack({term},{self.term(layer_index - 1, weight_index)},\"{weight}\").")
+            if layer_index == 1:
+                continue
+            previous_layer = self.layer_term(layer_index - 1)
+            for term, (bias, edges) in zip(terms, self.__in_edges(layer_index)):
+                res.append(f"attack({term},top,\"{_weight_to_str(bias)}\").")
+                res.extend(
+                    f"attack({term},{previous_layer}_{node},\"{_weight_to_str(weight)}\")."
+                    for node, weight in edges
+                )
         return Model.of_program(res)
 
 
@@ -284,6 +661,28 @@ class ArgumentationGraph(NetworkInterface):
                 res.add_attack(int(attacker), int(attacked), convert(weight))
         return res.complete()
 
+    @staticmethod
+    def parse_container_implementation(metadata: dict, arrays: dict, key: Any) -> 'ArgumentationGraph':
+        NetworkInterface.validate_parse_key(key)
+        res = ArgumentationGraph()
+        for attacker, attacked, weight in zip(arrays["attacker"].tolist(), arrays["attacked"].tolist(),
+                                              arrays["weight"].tolist()):
+            res.add_attack(attacker, attacked, weight)
+        return res.complete()
+
+    def _as_container(self) -> Tuple[dict, dict]:
+        attacks = sorted(self.__attacks)
+        return {}, {
+            "attacker": np.array([attacker for attacker, _, _ in attacks], dtype=np.int64),
+            "attacked": np.array([attacked for _, attacked, _ in attacks], dtype=np.int64),
+            "weight": np.array([weight for _, _, weight in attacks], dtype=float),
+        }
+
+    def _serialize(self) -> str:
+        return '\n'.join(["#graph"] + [
+            f"{attacker} {attacked} {_weight_to_str(weight)}" for attacker, attacked, weight in sorted(self.__attacks)
+        ]) + '\n'
+
     def add_attack(self, attacker: int, attacked: int, weight: float) -> 'ArgumentationGraph':
         self.__attacks.add((attacker, attacked, weight))
         return self
@@ -317,9 +716,49 @@ class ArgumentationGraph(NetworkInterface):
             for (attacker, attacked, weight) in self.__attacks
         ])
 
-    def _register_propagators(self, control: clingo.Control, val_phi: List[float]) -> None:
+    def _register_propagators(self, control: clingo.Control, val_phi: List[float],
+                              nodes: Optional[Set[str]]) -> List[ValPhiPropagator]:
+        res = []
         for attacked in self.attacked:
-            control.register_propagator(ValPhiPropagator(self.term(attacked), val_phi=val_phi))
+            if nodes is not None and self.term(attacked) not in nodes:
+                continue
+            propagator = ValPhiPropagator(self.term(attacked), val_phi=val_phi)
+            control.register_propagator(propagator)
+            res.append(propagator)
+        return res
+
+    def _propagate_bounds(self, val_phi: List[float], bounds: Dict[str, Tuple[int, int]]) -> Dict[str, Tuple[int, int]]:
+        max_value = len(val_phi)
+        arguments = sorted(self.arguments)
+        index = {argument: position for position, argument in enumerate(arguments)}
+        weights = np.zeros((len(arguments), len(arguments)))
+        for attacker, attacked, weight in self.__attacks:
+            weights[index[attacked], index[attacker]] += weight
+        attacked = np.array([argument in self.attacked for argument in arguments], dtype=bool)
+        positive, negative = np.maximum(weights, 0), np.minimum(weights, 0)
+        tolerance = _sum_tolerance(val_phi, weights, np.zeros(len(arguments)), max_value)
+        terms = [self.term(argument) for argument in arguments]
+
+        lower = np.zeros(len(arguments), dtype=np.int64)
+        upper = np.full(len(arguments), max_value, dtype=np.int64)
+        _apply_bounds(terms, lower, upper, bounds)
+        # the graph may be cyclic: narrow the intervals until a fixpoint is reached
+        while True:
+            new_lower, new_upper = _degrees_of_sums(
+                val_phi, positive @ lower + negative @ upper, positive @ upper + negative @ lower, tolerance,
+            )
+            new_lower = np.where(attacked, np.maximum(lower, new_lower), lower)
+            new_upper = np.where(attacked, np.minimum(upper, new_upper), upper)
+            if np.array_equal(new_lower, lower) and np.array_equal(new_upper, upper):
+                break
+            if np.any(new_lower > new_upper):
+                lower, upper = new_lower, new_upper
+                break
+            lower, upper = new_lower, new_upper
+
+        res = dict(bounds)
+        res.update(zip(terms, zip(lower.tolist(), upper.tolist())))
+        return res
 
     def _approximate(self, multiplier: int) -> "ArgumentationGraph":
         res = ArgumentationGraph()
@@ -328,6 +767,9 @@ class ArgumentationGraph(NetworkInterface):
         )
         return res.complete()
 
+    def _input_nodes(self) -> List[str]:
+        return [self.term(argument) for argument in sorted(self.arguments - self.attacked)]
+
     def _as_attack_graph(self) -> Model:
         return self.network_facts.filter(when=lambda atom: atom.predicate_name == "attack")
 
@@ -437,13 +879,20 @@ weighted_typicality_inclusion(even(I+1),even''(I+1),{max_value}) :- I = 0..{max_
         self.validate_is_complete()
         return [truth_degree * self.number_of_clauses for truth_degree in range(self.number_of_clauses)]
 
-    def _register_propagators(self, control: clingo.Control, val_phi: List[float]) -> None:
+    def _register_propagators(self, control: clingo.Control, val_phi: List[float],
+                              nodes: Optional[Set[str]]) -> List[ValPhiPropagator]:
+        res = []
         output_nodes = Model.of_program(self.network_facts.as_facts, """
 #show.
 #show Node : weighted_typicality_inclusion(Node,_,_).
         """)
         for node in output_nodes:
-            control.register_propagator(ValPhiPropagator(str(node), val_phi=val_phi))
+            if nodes is not None and str(node) not in nodes:
+                continue
+            propagator = ValPhiPropagator(str(node), val_phi=val_phi)
+            control.register_propagator(propagator)
+            res.append(propagator)
+        return res
 
     def _approximate(self, multiplier: int) -> "NetworkInterface":
         return self
@@ -0,0 +1,15 @@
+from enum import Enum
+from typing import Final
+
+DEFAULT_VAL_PHI: Final = (-10.987, -4.237, 0, 4.236, 10.986)
+
+
+class ParallelMode(str, Enum):
+    COMPETE = "compete"
+    SPLIT = "split"
+
+
+class QueryEngine(str, Enum):
+    OPTIMIZATION = "optimization"
+    BINARY = "binary"
+    DESCENDING = "descending"
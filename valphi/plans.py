@@ -0,0 +1,72 @@
+import dataclasses
+from typing import List, Dict, Final
+
+import clingo
+import typeguard
+
+from valphi.networks import NetworkInterface
+
+PROPAGATOR_WATCH_COST: Final = 32
+"""
+Cost of a watched literal of a propagator, relative to an element of a ground weight constraint.
+Propagators are written in Python and are notified of each assignment, so that weight constraints are preferred unless
+their ground size is quadratic in a large number of truth degrees (measured on networks with up to 48 inputs per node
+and 9 truth degrees, where weight constraints were always faster).
+"""
+
+
+@typeguard.typechecked
+@dataclasses.dataclass(frozen=True)
+class NodePlan:
+    """
+    The estimated costs of the two treatments of a node (weighted_typicality_inclusion/3 with some input).
+    """
+    node: str
+    fan_in: int
+    weight_constraint_size: int
+    propagator_cost: int
+
+    @property
+    def use_weight_constraints(self) -> bool:
+        return self.weight_constraint_size <= self.propagator_cost
+
+
+def _is_zero(weight: clingo.Symbol) -> bool:
+    if weight.type == clingo.SymbolType.Number:
+        return weight.number == 0
+    return float(weight.string) == 0
+
+
+def plan_nodes(network: NetworkInterface, max_value: int, ordered: bool = False) -> List[NodePlan]:
+    """
+    Estimate the ground size of weight constraints and the cost of a propagator for each node of the network.
+
+    Inputs with weight 0 are ignored, and crisp inputs (and top) count a single nonzero truth degree.
+    Weight constraints are two per truth degree, and each one has an element for each input and nonzero truth degree.
+    A propagator watches both signs of the eval/3 atoms of its inputs, and scans all eval/3 atoms when initialized.
+    """
+    crisp = {"top"}
+    inputs: Dict[str, List[str]] = {}
+    concepts = set()
+    for atom in network.network_facts:
+        if atom.predicate_name == "crisp":
+            crisp.add(str(atom.arguments[0]))
+        elif atom.predicate_name == "weighted_typicality_inclusion":
+            node, input_node, weight = atom.arguments
+            concepts.update([str(node), str(input_node)])
+            node_inputs = inputs.setdefault(str(node), [])
+            if not _is_zero(weight):
+                node_inputs.append(str(input_node))
+
+    number_of_constraints = 2 * (max_value if ordered else max_value + 1)
+    res = []
+    for node, node_inputs in inputs.items():
+        values = [1 if input_node in crisp else max_value for input_node in node_inputs]
+        res.append(NodePlan(
+            node=node,
+            fan_in=len(node_inputs),
+            weight_constraint_size=number_of_constraints * sum(values),
+            propagator_cost=PROPAGATOR_WATCH_COST * 2 * sum(value + 1 for value in values)
+                            + len(concepts) * (max_value + 1),
+        ))
+    return res
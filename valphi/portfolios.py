@@ -0,0 +1,83 @@
+import dataclasses
+import multiprocessing
+import time
+from typing import List, Tuple, Final
+
+import typeguard
+from dumbo_utils.validation import validate
+
+from valphi.controllers import Controller
+
+OPTIMIZATION_STRATEGIES: Final = {
+    "bb": [],
+    "usc": ["--opt-strategy=usc,k,4", "--opt-usc-shrink=rgs"],
+}
+
+
+@typeguard.typechecked
+@dataclasses.dataclass(frozen=True)
+class PortfolioResult:
+    """
+    The first answer proven by a configuration of the portfolio, and the configuration that found it.
+    """
+    configuration: str
+    seconds: float
+    answer: Controller.QueryResult
+
+
+def default_portfolio(controller: Controller) -> List[Tuple[str, Controller]]:
+    """
+    Labelled variants of controller with the same semantics: the ordered encoding on or off, the optimization strategies,
+    and either the propagators or (if controller uses weight constraints) weight constraints and the hybrid mode.
+    """
+    treatments = [("propagator", {})] if controller.use_wc is None \
+        else [("weight constraints", {"use_hybrid": False}), ("hybrid", {"use_hybrid": True})]
+    res = []
+    for treatment, changes in treatments:
+        for ordered in [False, True]:
+            for strategy, arguments in OPTIMIZATION_STRATEGIES.items():
+                res.append((
+                    f"{treatment}, {'ordered' if ordered else 'unordered'}, {strategy}",
+                    dataclasses.replace(controller, use_ordered_encoding=ordered,
+                                        clingo_arguments=controller.clingo_arguments + arguments, **changes),
+                ))
+    return res
+
+
+def answer_query(configurations: List[Tuple[str, Controller]], query: str) -> PortfolioResult:
+    """
+    Answer the query with each configuration in its own process, and return the first answer (the other processes are
+    terminated). Configurations raising an error are ignored, unless all of them fail.
+    """
+    validate("configurations", configurations, min_len=1)
+    start = time.perf_counter()
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_answer_query, args=(index, controller, query, queue), daemon=True)
+                 for index, (_, controller) in enumerate(configurations)]
+    for process in processes:
+        process.start()
+    try:
+        errors = []
+        while len(errors) < len(configurations):
+            index, answer, error = queue.get()
+            if answer is None:
+                errors.append(f"{configurations[index][0]}: {error}")
+                continue
+            return PortfolioResult(
+                configuration=configurations[index][0],
+                seconds=time.perf_counter() - start,
+                answer=answer,
+            )
+        raise RuntimeError("All configurations failed; " + "; ".join(errors))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+def _answer_query(index: int, controller: Controller, query: str, queue: multiprocessing.Queue) -> None:
+    try:
+        queue.put((index, controller.answer_query(query), None))
+    except Exception as e:
+        queue.put((index, None, str(e)))
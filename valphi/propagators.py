@@ -1,118 +1,430 @@
-from typing import Optional, List
+import bisect
+import math
+from typing import Optional, List, Dict, Set, Tuple, Callable
 
 import clingo
 from clingo.propagator import Propagator
 from dumbo_utils.validation import validate
 
 
+class ThreadState:
+    """
+    The part of the state of a propagator that depends on the assignment of a solver thread, for one individual.
+    Inputs are referred to by their position in ValPhiPropagator.input_nodes, and the individual by its position in
+    ValPhiPropagator.individuals.
+    There is no trail: reasons are rebuilt from the domains, and undo reverts the changes of each decision level.
+    """
+    def __init__(self, individual: int, input_value: List[Optional[int]], input_domain: List[Set[int]],
+                 output_value: Optional[int], output_domain: Set[int]):
+        self.individual = individual
+        self.input_value = list(input_value)
+        self.input_domain = [set(values) for values in input_domain]
+        self.input_range = [None] * len(input_value)
+        for index in range(len(input_value)):
+            self.update_input_range(index)
+        self.unassigned_inputs = sum(1 for value in input_value if value is None)
+        self.output_value = output_value
+        self.output_domain = set(output_domain)
+
+    def update_input_range(self, index: int) -> None:
+        value = self.input_value[index]
+        if value is not None:
+            self.input_range[index] = (value, value)
+        elif self.input_domain[index]:
+            self.input_range[index] = (min(self.input_domain[index]), max(self.input_domain[index]))
+        else:
+            self.input_range[index] = None
+
+
+# a watched literal is associated with events of the form (individual, input, value, is_true), where input is the
+# position of an input node or OUTPUT: the node is assigned the value for the individual if is_true, and the value is
+# removed from its domain otherwise
+Event = Tuple[int, int, int, bool]
+OUTPUT = -1
+
+
 class ValPhiPropagator(Propagator):
-    def __init__(self, output_node: str, val_phi: List[float]):
+    def __init__(self, output_node: str, val_phi: List[float],
+                 input_weights: Optional[Dict[clingo.Symbol, float]] = None):
         super().__init__()
         self.output_node = output_node
         self.val_phi = list(val_phi)
         self.max_value = len(self.val_phi)
-        self.trail = []
-        self.input_nodes = set()
-        self.input_node_lit_to_value = {}
-        self.input_value = {}
-        self.input_weight = {}
-        self.output_node_lit_to_value = {}
-        self.output_value_to_node_lit = {}
-        self.output_value = None
+        self.given_input_weights = None if input_weights is None else dict(input_weights)
+        self.weight_overrides = {}
+        self.tag_clauses = False
+        self.input_nodes: List[clingo.Symbol] = []
+        self.input_index: Dict[clingo.Symbol, int] = {}
+        self.input_weight: Dict[clingo.Symbol, float] = {}
+        self.weights: List[float] = []
+        # the following lists are indexed by individual, and the states by thread and individual
+        self.individuals: List[clingo.Symbol] = []
+        self.individual_index: Dict[clingo.Symbol, int] = {}
+        self.input_value: List[List[Optional[int]]] = []
+        self.input_domain: List[List[Set[int]]] = []
+        self.input_value_to_lit: List[List[Dict[int, int]]] = []
+        self.output_value_to_node_lit: List[Dict[int, int]] = []
+        self.output_value: List[Optional[int]] = []
+        self.output_domain: List[Set[int]] = []
+        self.events: Dict[int, List[Event]] = {}
+        self.initial_contributions: List[List[Optional[Tuple[float, float]]]] = []
+        self.tolerance = 0.
+        self.states: List[List[ThreadState]] = []
 
     def __reset(self):
-        self.trail.clear()
         self.input_nodes.clear()
-        self.input_node_lit_to_value.clear()
-        self.input_value.clear()
+        self.input_index.clear()
         self.input_weight.clear()
-        self.output_node_lit_to_value.clear()
+        self.weights.clear()
+        self.individuals.clear()
+        self.individual_index.clear()
+        self.input_value.clear()
+        self.input_domain.clear()
+        self.input_value_to_lit.clear()
         self.output_value_to_node_lit.clear()
-        self.output_value = None
+        self.output_value.clear()
+        self.output_domain.clear()
+        self.events.clear()
+        self.initial_contributions.clear()
+        self.tolerance = 0.
+        self.states.clear()
 
     def __validate_max_value(self, init) -> None:
         max_value = max(s.symbol.arguments[0].number for s in init.symbolic_atoms.by_signature("truth_degree", 1))
         validate("max_value", max_value, equals=self.max_value,
                  help_msg="The provided ValPhi doesn't match the number of truth values")
 
+    def __add_input_node(self, concept: clingo.Symbol, weight: float) -> None:
+        if concept not in self.input_index:
+            self.input_index[concept] = len(self.input_nodes)
+            self.input_nodes.append(concept)
+        self.input_weight[concept] = weight
+
     def __read_input_nodes(self, init) -> None:
-        for s in init.symbolic_atoms.by_signature("weighted_typicality_inclusion", 3):
-            concept1, concept2, weight = s.symbol.arguments
-            if str(concept1) == self.output_node:
-                self.input_nodes.add(concept2)
-                self.input_value[concept2] = None
-                self.input_weight[concept2] = float(weight.string) if weight.type == clingo.SymbolType.String \
-                    else float(weight.number)
+        if self.given_input_weights is not None:
+            for concept, weight in self.given_input_weights.items():
+                self.__add_input_node(concept, weight)
+        else:
+            for s in init.symbolic_atoms.by_signature("weighted_typicality_inclusion", 3):
+                concept1, concept2, weight = s.symbol.arguments
+                if str(concept1) == self.output_node:
+                    self.__add_input_node(concept2, float(weight.string) if weight.type == clingo.SymbolType.String
+                                          else float(weight.number))
+        self.__apply_weight_overrides()
+        self.weights.extend(self.input_weight[concept] for concept in self.input_nodes)
+
+    def __add_individual(self, individual: clingo.Symbol) -> int:
+        index = self.individual_index.get(individual)
+        if index is None:
+            index = self.individual_index[individual] = len(self.individuals)
+            self.individuals.append(individual)
+            self.input_value.append([None for _ in self.input_nodes])
+            self.input_domain.append([set() for _ in self.input_nodes])
+            self.input_value_to_lit.append([{} for _ in self.input_nodes])
+            self.output_value_to_node_lit.append({})
+            self.output_value.append(None)
+            self.output_domain.append(set())
+        return index
+
+    def __apply_weight_overrides(self) -> None:
+        for concept, weight in self.weight_overrides.items():
+            validate("input node", concept in self.input_weight, equals=True,
+                     help_msg=f"{concept} is not an input of {self.output_node}")
+            self.input_weight[concept] = weight
+
+    def update_weight(self, input_node: clingo.Symbol, weight: float) -> None:
+        """
+        Change the weight of an existing input; it takes effect from the next solving step.
+        Use together with tag_clauses, so that clauses justified by the old weight are dropped.
+        """
+        self.weight_overrides[input_node] = weight
+        if self.input_weight:
+            self.__apply_weight_overrides()
+
+    def update_val_phi(self, val_phi: List[float]) -> None:
+        """
+        Change the ValPhi function, keeping the number of truth degrees; it takes effect from the next solving step.
+        Use together with tag_clauses, so that clauses justified by the old function are dropped.
+        """
+        validate("val_phi", len(val_phi), equals=self.max_value,
+                 help_msg="The number of truth degrees cannot be changed")
+        self.val_phi = list(val_phi)
 
     def __read_eval(self, init) -> None:
         for s in init.symbolic_atoms.by_signature("eval", 3):
             concept, individual, value = s.symbol.arguments
-            validate("empty ABox", individual, equals=clingo.Function("anonymous"),
-                     help_msg="Propagator requires empty ABox")
+            is_output = str(concept) == self.output_node
+            index = self.input_index.get(concept)
+            if not is_output and index is None:
+                continue
             lit = init.solver_literal(s.literal)
-            if self.__is_false(lit):
+            # literals fixed by previous solving steps are not propagated again
+            if init.assignment.is_false(lit):
                 continue
-            if str(concept) == self.output_node:
-                if self.__is_true(lit):
-                    self.output_value = value.number
+            individual = self.__add_individual(individual)
+            if is_output:
+                self.output_domain[individual].add(value.number)
+                if init.assignment.is_true(lit):
+                    self.output_value[individual] = value.number
                 else:
-                    assert lit not in self.output_node_lit_to_value
-                    self.output_node_lit_to_value[lit] = value.number
-                    self.output_value_to_node_lit[value.number] = lit
-                    init.add_watch(lit)
-            if concept in self.input_nodes:
-                if self.__is_true(lit):
-                    self.input_value[concept] = value.number
+                    self.output_value_to_node_lit[individual][value.number] = lit
+                    self.__watch(init, lit, individual, OUTPUT, value.number)
+            if index is not None:
+                self.input_domain[individual][index].add(value.number)
+                if init.assignment.is_true(lit):
+                    self.input_value[individual][index] = value.number
                 else:
-                    assert lit not in self.input_node_lit_to_value
-                    self.input_node_lit_to_value[lit] = (concept, value.number)
-                    init.add_watch(lit)
+                    self.input_value_to_lit[individual][index][value.number] = lit
+                    self.__watch(init, lit, individual, index, value.number)
+
+    def __watch(self, init, lit: int, individual: int, node: int, value: int) -> None:
+        for watched, is_true in ((lit, True), (-lit, False)):
+            if watched not in self.events:
+                self.events[watched] = []
+                init.add_watch(watched)
+            self.events[watched].append((individual, node, value, is_true))
+
+    def __compute_tolerance(self) -> float:
+        # sums of integers are exact; otherwise, bounds are relaxed to absorb rounding errors
+        if all(float(number).is_integer() for number in self.weights + self.val_phi):
+            return 0.
+        return 1e-9 * (sum(abs(weight) for weight in self.weights) * self.max_value
+                       + max(abs(value) for value in self.val_phi) + 1)
 
     def init(self, init):
         self.__reset()
         self.__validate_max_value(init)
         self.__read_input_nodes(init)
         self.__read_eval(init)
+        self.tolerance = self.__compute_tolerance()
+        # the values read so far are fixed at the top level, and shared by all solver threads
+        self.states.extend([ThreadState(individual, self.input_value[individual], self.input_domain[individual],
+                                        self.output_value[individual], self.output_domain[individual])
+                            for individual in range(len(self.individuals))]
+                           for _ in range(init.number_of_threads))
+        self.initial_contributions.extend(self.__contributions(state) for state in self.states[0])
 
     def propagate(self, ctl, changes):
+        states = self.states[ctl.thread_id]
+        # individuals are propagated in order of notification, so that the clauses do not depend on hashing
+        changed: Dict[int, None] = {}
         for lit in changes:
-            self.trail.append(lit)
-            if lit in self.output_node_lit_to_value:
-                self.output_value = self.output_node_lit_to_value[lit]
-            if lit in self.input_node_lit_to_value:
-                concept, value = self.input_node_lit_to_value[lit]
-                self.input_value[concept] = value
-
-        output_value = self.__compute_output_value()
+            if lit not in self.events:
+                continue  # watched in a previous solving step, and now fixed
+            for individual, node, value, is_true in self.events[lit]:
+                changed[individual] = None
+                state = states[individual]
+                if node == OUTPUT:
+                    if is_true:
+                        state.output_value = value
+                    else:
+                        state.output_domain.discard(value)
+                    continue
+                if is_true:
+                    state.input_value[node] = value
+                    state.unassigned_inputs -= 1
+                else:
+                    state.input_domain[node].discard(value)
+                state.update_input_range(node)
+
+        for individual in changed:
+            self.__propagate_individual(ctl, states[individual])
+            if ctl.assignment.has_conflict:
+                return
+
+    def __propagate_individual(self, ctl, state: ThreadState) -> None:
+        output_value = self.__compute_output_value(state)
         if output_value is None:
+            self.__propagate_bounds(ctl, state)
             return
-        if self.output_value is None:
-            if output_value in self.output_value_to_node_lit:
-                unit = self.output_value_to_node_lit[output_value]
-                if ctl.add_clause([-lit for lit in self.trail] + [unit]):
+        if state.output_value is None:
+            reason = self.__output_reason(state, output_value, output_value)
+            if output_value in self.output_value_to_node_lit[state.individual]:
+                unit = self.output_value_to_node_lit[state.individual][output_value]
+                if ctl.add_clause([-lit for lit in reason] + [unit], tag=self.tag_clauses):
                     ctl.propagate()
             else:
-                ctl.add_clause([-lit for lit in self.trail])
+                ctl.add_clause([-lit for lit in reason], tag=self.tag_clauses)
             return
-        if output_value != self.output_value:
-            ctl.add_clause([-lit for lit in self.trail])
+        if output_value != state.output_value:
+            reason = self.__output_reason(state, state.output_value + 1, self.max_value) \
+                if output_value > state.output_value else self.__output_reason(state, 0, state.output_value - 1)
+            ctl.add_clause([-lit for lit in reason + self.__output_literals(state, True, True)],
+                           tag=self.tag_clauses)
 
     def undo(self, thread_id, assignment, changes):
+        states = self.states[thread_id]
         for lit in reversed(changes):
-            assert lit == self.trail[-1]
-            self.trail.pop()
-            if lit in self.output_node_lit_to_value:
-                self.output_value = None
+            if lit not in self.events:
+                continue
+            for individual, node, value, is_true in self.events[lit]:
+                state = states[individual]
+                if node == OUTPUT:
+                    if is_true:
+                        state.output_value = None
+                    else:
+                        state.output_domain.add(value)
+                    continue
+                if is_true:
+                    state.input_value[node] = None
+                    state.unassigned_inputs += 1
+                else:
+                    state.input_domain[node].add(value)
+                state.update_input_range(node)
+
+    def __degree(self, weight: float) -> int:
+        return bisect.bisect_left(self.val_phi, weight)
+
+    def __contributions(self, state: ThreadState) -> List[Optional[Tuple[float, float]]]:
+        return [None if node_range is None
+                else (weight * node_range[0], weight * node_range[1]) if weight >= 0
+                else (weight * node_range[1], weight * node_range[0])
+                for weight, node_range in zip(self.weights, state.input_range)]
+
+    def __input_literals(self, state: ThreadState, node: int, low: bool, high: bool) -> List[int]:
+        """
+        True literals fixing the lowest (if low) and the highest (if high) value still possible for the input.
+        """
+        value_to_lit = self.input_value_to_lit[state.individual][node]
+        value = state.input_value[node]
+        if value is not None:
+            return [value_to_lit[value]] if value in value_to_lit else []
+        min_value, max_value = state.input_range[node]
+        return [-lit for value, lit in value_to_lit.items() if value not in state.input_domain[node] and
+                ((low and value < min_value) or (high and value > max_value))]
+
+    def __output_literals(self, state: ThreadState, low: bool, high: bool) -> List[int]:
+        """
+        True literals fixing the lowest (if low) and the highest (if high) degree still possible for the output.
+        """
+        value_to_lit = self.output_value_to_node_lit[state.individual]
+        if state.output_value is not None:
+            lit = value_to_lit.get(state.output_value)
+            return [] if lit is None else [lit]
+        outputs = state.output_domain
+        return [-lit for value, lit in value_to_lit.items() if value not in outputs and
+                ((low and value < min(outputs)) or (high and value > max(outputs)))]
+
+    def __reason(self, state: ThreadState, contributions: List[Tuple[float, float]],
+                 holds: Callable[[float, float], bool], exclude: Optional[int] = None) -> Optional[List[int]]:
+        """
+        True literals implying that the bounds of the weighted sum (of inputs other than exclude) satisfy holds.
+        Greedily, the range of each input is relaxed to its top-level range, or one of its sides is, if holds is
+        preserved; None is returned if holds is not implied by the current ranges.
+        """
+        initial_contributions = self.initial_contributions[state.individual]
+        nodes = [node for node in range(len(self.weights))
+                 if node != exclude and contributions[node] != initial_contributions[node]]
+        lower = sum(contributions[node][0] for node in range(len(self.weights)) if node != exclude)
+        upper = sum(contributions[node][1] for node in range(len(self.weights)) if node != exclude)
+        if not holds(lower, upper):
+            return None
+        # relax first the inputs that tighten the bounds the least
+        nodes.sort(key=lambda node: (contributions[node][0] - initial_contributions[node][0]) +
+                                    (initial_contributions[node][1] - contributions[node][1]))
+        res = []
+        for node in nodes:
+            initial_lower, initial_upper = initial_contributions[node]
+            relaxed_lower = lower - contributions[node][0] + initial_lower
+            relaxed_upper = upper - contributions[node][1] + initial_upper
+            if holds(relaxed_lower, relaxed_upper):
+                lower, upper = relaxed_lower, relaxed_upper
+                continue
+            # the lower contribution is given by the lowest value if the weight is positive, and vice versa
+            positive = self.weights[node] >= 0
+            if holds(lower, relaxed_upper):
+                res.extend(self.__input_literals(state, node, low=positive, high=not positive))
+                upper = relaxed_upper
+            elif holds(relaxed_lower, upper):
+                res.extend(self.__input_literals(state, node, low=not positive, high=positive))
+                lower = relaxed_lower
+            else:
+                res.extend(self.__input_literals(state, node, low=True, high=True))
+        return res
+
+    def __output_reason(self, state: ThreadState, min_output: int, max_output: int) -> List[int]:
+        """
+        True literals implying that the output degree is in min_output..max_output.
+        The weighted sum is exact if all inputs are assigned, and all of them are the reason if the bounds (relaxed by
+        the tolerance) are not enough to fix the degree.
+        """
+        reason = self.__reason(state, self.__contributions(state), lambda lower, upper: (
+            (min_output == 0 or lower - self.tolerance > self.val_phi[min_output - 1]) and
+            (max_output == self.max_value or upper + self.tolerance <= self.val_phi[max_output])
+        ))
+        if reason is not None:
+            return reason
+        return [lit for node in range(len(self.weights)) for lit in self.__input_literals(state, node, True, True)]
+
+    def __propagate_bounds(self, ctl, state: ThreadState) -> None:
+        """
+        Prune output degrees that cannot be obtained from the weighted sums still reachable, and input values that
+        cannot lead to any of the output degrees still possible.
+        """
+        if any(node_range is None for node_range in state.input_range):
+            return
+        contributions = self.__contributions(state)
+        lower = sum(contribution[0] for contribution in contributions)
+        upper = sum(contribution[1] for contribution in contributions)
+
+        min_output, max_output = self.__degree(lower - self.tolerance), self.__degree(upper + self.tolerance)
+        if state.output_value is not None and not min_output <= state.output_value <= max_output:
+            reason = self.__output_reason(state, state.output_value + 1, self.max_value) \
+                if state.output_value < min_output else self.__output_reason(state, 0, state.output_value - 1)
+            ctl.add_clause([-lit for lit in reason + self.__output_literals(state, True, True)],
+                           tag=self.tag_clauses)
+            return
+        low_reason, high_reason = None, None
+        for value, pruned in self.output_value_to_node_lit[state.individual].items():
+            if min_output <= value <= max_output or value not in state.output_domain or state.output_value == value:
+                continue
+            if value < min_output:
+                if low_reason is None:
+                    low_reason = self.__output_reason(state, min_output, self.max_value)
+                reason = low_reason
+            else:
+                if high_reason is None:
+                    high_reason = self.__output_reason(state, 0, max_output)
+                reason = high_reason
+            if not ctl.add_clause([-lit for lit in reason] + [-pruned], tag=self.tag_clauses) \
+                    or not ctl.propagate():
+                return
+
+        outputs = [state.output_value] if state.output_value is not None else state.output_domain
+        if not outputs:
+            return
+        # the weighted sum must be in (val_phi[min(outputs) - 1], val_phi[max(outputs)]]
+        min_sum = self.val_phi[min(outputs) - 1] - self.tolerance if min(outputs) > 0 else -math.inf
+        max_sum = self.val_phi[max(outputs)] + self.tolerance if max(outputs) < self.max_value else math.inf
+        if lower > min_sum and upper <= max_sum:
+            return
+        for node, weight in enumerate(self.weights):
+            if state.input_value[node] is not None or weight == 0:
                 continue
-            assert lit in self.input_node_lit_to_value
-            concept, value = self.input_node_lit_to_value[lit]
-            self.input_value[concept] = None
+            for value, pruned in self.input_value_to_lit[state.individual][node].items():
+                if value not in state.input_domain[node]:
+                    continue
+                contribution = weight * value
+                if lower - contributions[node][0] + contribution > max_sum:
+                    reason = self.__reason(state, contributions, lambda others_lower, _:
+                                           others_lower + contribution > max_sum, exclude=node) \
+                        + self.__output_literals(state, low=False, high=True)
+                elif upper - contributions[node][1] + contribution <= min_sum:
+                    reason = self.__reason(state, contributions, lambda _, others_upper:
+                                           others_upper + contribution <= min_sum, exclude=node) \
+                        + self.__output_literals(state, low=True, high=False)
+                else:
+                    continue
+                if not ctl.add_clause([-lit for lit in reason] + [-pruned], tag=self.tag_clauses) \
+                        or not ctl.propagate():
+                    return
 
-    def __compute_output_value(self) -> Optional[int]:
-        if any(x is None for x in self.input_value.values()):
+    def __compute_output_value(self, state: ThreadState) -> Optional[int]:
+        if state.unassigned_inputs > 0:
             return None
 
-        weight = sum(self.input_value[node] * self.input_weight[node] for node in self.input_nodes)
+        # fsum is exactly rounded, so that the result does not depend on the order of the inputs
+        weight = math.fsum(value * weight for value, weight in zip(state.input_value, self.weights))
         actual = self.max_value
         for index, value in enumerate(self.val_phi):
             if weight <= value:
@@ -120,19 +432,13 @@ class ValPhiPropagator(Propagator):
                 break
         return actual
 
-    def print_state(self):
+    def print_state(self, thread_id: int = 0):
         print(f"ValPhi-propagator for {self.output_node}")
-        for node in self.input_nodes:
-            print(f"  {node} = {self.input_value[node]}  [{self.input_weight[node]}]")
-        weight_value = self.__compute_output_value()
-        print(f"  {self.output_node} = {self.output_value}")
-        if weight_value:
-            print(f"  valphi = {weight_value}")
-
-    @staticmethod
-    def __is_false(lit: int) -> bool:
-        return lit == -1
-
-    @staticmethod
-    def __is_true(lit: int) -> bool:
-        return lit == 1
+        for individual, state in zip(self.individuals, self.states[thread_id]):
+            print(f" individual {individual}")
+            for index, node in enumerate(self.input_nodes):
+                print(f"  {node} = {state.input_value[index]}  [{self.weights[index]}]")
+            weight_value = self.__compute_output_value(state)
+            print(f"  {self.output_node} = {state.output_value}")
+            if weight_value:
+                print(f"  valphi = {weight_value}")
@@ -0,0 +1,90 @@
+import dataclasses
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple, Dict
+
+import typeguard
+from dumbo_utils.validation import validate
+
+from valphi.controllers import Controller
+from valphi.networks import MaxSAT
+
+
+@typeguard.typechecked
+@dataclasses.dataclass(frozen=True)
+class SweepResult:
+    """
+    The outcome of a single ValPhi function: the number of solutions, or the answer to the query.
+    """
+    label: str
+    max_value: int
+    seconds: float
+    number_of_solutions: Optional[int] = dataclasses.field(default=None)
+    true: Optional[bool] = dataclasses.field(default=None)
+    consistent_knowledge_base: Optional[bool] = dataclasses.field(default=None)
+    left_concept_value: Optional[float] = dataclasses.field(default=None)
+    witness: Optional[bool] = dataclasses.field(default=None)
+
+
+def sweep(controller: Controller, val_phis: List[Tuple[str, List[float]]], query: Optional[str] = None,
+          max_workers: Optional[int] = None) -> List[SweepResult]:
+    """
+    Count the solutions, or answer the query, for each labelled ValPhi function (the val_phi of controller is ignored).
+
+    Functions with the same number of truth degrees form a group, and groups are processed in parallel (max_workers=1
+    processes them sequentially in the current process). Within a group, the program is grounded once if ValPhi is
+    only used by propagators, and otherwise once per function.
+    """
+    validate("val_phis", val_phis, min_len=1)
+    validate("network", type(controller.network) is MaxSAT, equals=False,
+             help_msg="ValPhi is fixed by the instance for MaxSAT")
+    if max_workers is not None:
+        validate("max_workers", max_workers, min_value=1)
+    for label, val_phi in val_phis:
+        validate("val_phi", val_phi, min_len=1, help_msg=f"{label} is empty")
+
+    groups: Dict[int, List[Tuple[int, str, List[float]]]] = {}
+    for index, (label, val_phi) in enumerate(val_phis):
+        groups.setdefault(len(val_phi), []).append((index, label, val_phi))
+
+    if max_workers == 1 or len(groups) == 1:
+        outcomes = [_sweep_group(controller, group, query) for group in groups.values()]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            outcomes = list(executor.map(_sweep_group, [controller] * len(groups), groups.values(),
+                                         [query] * len(groups)))
+
+    res: List[Optional[SweepResult]] = [None] * len(val_phis)
+    for outcome in outcomes:
+        for index, result in outcome:
+            res[index] = result
+    return res
+
+
+def _sweep_group(controller: Controller, group: List[Tuple[int, str, List[float]]],
+                 query: Optional[str]) -> List[Tuple[int, SweepResult]]:
+    shared = controller.use_wc is None and not controller.use_domain_pruning
+    session = None
+    res = []
+    for index, label, val_phi in group:
+        start = time.perf_counter()
+        if controller.use_hybrid:
+            # sessions do not support the hybrid mode
+            single = dataclasses.replace(controller, val_phi=val_phi)
+            find_solutions, answer_query = single.find_solutions, lambda: single.answer_query(query)
+        else:
+            if session is None or not shared:
+                session = dataclasses.replace(controller, val_phi=val_phi).open_session(query)
+            else:
+                session.update_val_phi(val_phi)
+            find_solutions, answer_query = session.find_solutions, session.answer_query
+        if query is None:
+            result = SweepResult(label=label, max_value=len(val_phi), seconds=0,
+                                 number_of_solutions=len(find_solutions()))
+        else:
+            answer = answer_query()
+            result = SweepResult(label=label, max_value=len(val_phi), seconds=0, true=answer.true,
+                                 consistent_knowledge_base=answer.consistent_knowledge_base,
+                                 left_concept_value=answer.left_concept_value, witness=answer.witness)
+        res.append((index, dataclasses.replace(result, seconds=time.perf_counter() - start)))
+    return res
@@ -2,3 +2,21 @@ from pathlib import Path
 from typing import Final
 
 PROJECT_ROOT: Final = Path(__file__).parent.parent
+
+
+class frozendict(dict):
+    """
+    A hashable dictionary that cannot be modified after its creation (unlike the one of pydot, it can be pickled).
+    """
+    __slots__ = ()
+
+    def __hash__(self):
+        return hash(frozenset(self.items()))
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+    def __readonly(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} cannot be modified")
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = __readonly